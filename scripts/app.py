@@ -5,6 +5,19 @@ import plotly.express as px
 import numpy as np
 import os
 
+from base_colunar import carregar_base, compactar_colunas
+from inference_engine import compilar_ou_none, carregar_motor
+from prediction_cache import fingerprint_modelo
+from sensibilidade import varrer, eixo_com_valor, FAIXA_CHUVA, RATINGS, TIPOS_SOLO
+from explicabilidade import carregar_explicabilidade
+
+# Colunas da base usadas pelo dashboard (opções da sidebar + médias de contexto)
+COLUNAS_DASHBOARD = [
+    'cidade', 'etapa', 'tipo_solo', 'material',
+    'orcamento_estimado', 'complexidade_obra', 'risco_etapa', 'taxa_insucesso_fornecedor'
+]
+COLUNAS_CONTEXTO = ['orcamento_estimado', 'complexidade_obra', 'risco_etapa', 'taxa_insucesso_fornecedor']
+
 # 1. CONFIGURAÇÃO DA PÁGINA (Padrão Executivo)
 st.set_page_config(
     page_title="CCbjj - Engenharia", 
@@ -35,20 +48,75 @@ def load_assets():
     m_path = os.path.join(base_path, "models", "pipeline_random_forest.pkl")
     f_path = os.path.join(base_path, "models", "features_metadata.joblib")
     d_path = os.path.join(base_path, "data", "processed", "df_mestre_consolidado.csv.gz")
+    p_path = os.path.join(base_path, "data", "processed", "df_mestre_consolidado.parquet")
+    mm_path = os.path.join(base_path, "models", "motor_inferencia.joblib")
     
-    pipeline = joblib.load(m_path) if os.path.exists(m_path) else None
     features = joblib.load(f_path) if os.path.exists(f_path) else None
+    # Fingerprint lido ANTES de carregar: é a versão que fica em memória (chave do cache de cenários)
+    versao_modelo = fingerprint_modelo(m_path) if os.path.exists(m_path) else None
+    # Motor compilado em mmap (mesma interface predict); fallback: unpickle do pipeline
+    pipeline = carregar_motor(m_path, mm_path)
+    if pipeline is None and os.path.exists(m_path):
+        pipeline = joblib.load(m_path)
+        if features is not None:
+            pipeline = compilar_ou_none(pipeline, features) or pipeline
     
-    if os.path.exists(d_path):
-        df = pd.read_csv(d_path, compression='gzip')
-    else:
-        # Fallback para CSV comum se o GZ não existir
-        alt_path = d_path.replace(".gz", "")
-        df = pd.read_csv(alt_path) if os.path.exists(alt_path) else pd.DataFrame()
-        
-    return pipeline, features, df
+    # Parquet colunar (só as colunas usadas); fallback para CSV comum se o GZ não existir
+    csv_path = d_path if os.path.exists(d_path) else d_path.replace(".gz", "")
+    df = compactar_colunas(carregar_base(COLUNAS_DASHBOARD, parquet_path=p_path, csv_path=csv_path),
+                           preservar=features or ())
+    
+    # Agregados e opções calculados uma vez: reruns viram consultas a dicionário
+    contexto = agregar_contexto(df)
+    opcoes = {
+        col: sorted(str(x).title() for x in df[col].dropna().unique())
+        for col in ('cidade', 'etapa', 'tipo_solo', 'material') if col in df.columns
+    }
+    return pipeline, features, contexto, opcoes, versao_modelo
+
+def agregar_contexto(df: pd.DataFrame) -> dict:
+    """(cidade, etapa) -> médias, contagem e quantis de risco, num único groupby."""
+    if df.empty or not {'cidade', 'etapa'}.issubset(df.columns):
+        return {}
+    grupos = df.groupby(['cidade', 'etapa'], observed=True, sort=False)
+    tabela = grupos[[c for c in COLUNAS_CONTEXTO if c in df.columns]].mean()
+    tabela['n'] = grupos.size()
+    if 'risco_etapa' in df.columns:
+        quantis = grupos['risco_etapa'].quantile([0.5, 0.9]).unstack()
+        tabela['risco_p50'], tabela['risco_p90'] = quantis[0.5], quantis[0.9]
+    return {
+        (str(cidade), str(etapa)): {k: float(v) for k, v in linha.items()}
+        for (cidade, etapa), linha in tabela.iterrows()
+    }
+
+@st.cache_resource
+def load_explicabilidade():
+    """Artefato offline (PD + importâncias) da versão atual do modelo, ou None."""
+    base_path = os.getcwd()
+    return carregar_explicabilidade(
+        os.path.join(base_path, "models", "pipeline_random_forest.pkl"),
+        os.path.join(base_path, "models", "explicabilidade.joblib"),
+    )
 
-pipeline, features_order, df_base = load_assets()
+pipeline, features_order, contexto_base, opcoes_base, VERSAO_MODELO = load_assets()
+explicabilidade = load_explicabilidade()
+
+# 3. MOTOR DE SENSIBILIDADE (grade chuva × rating × solo, um predict por entrada)
+# Campos varridos pela grade: ficam FORA da chave do cache (trocar rating/solo é hit)
+EIXOS_VARRIDOS = ('nivel_chuva', 'rating_confiabilidade', 'tipo_solo')
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def analisar_cenarios(versao_modelo, contexto_fixo: tuple, solos: tuple, val_chuva: float):
+    """Grade completa de cenários memoizada pelo contexto fixo (sem os eixos) e versão do modelo."""
+    base = dict(contexto_fixo)
+    faixa_chuva, i_chuva = eixo_com_valor(FAIXA_CHUVA, val_chuva)
+    solos = list(solos)
+    grade = varrer(pipeline, base, features_order, {
+        'nivel_chuva': faixa_chuva,
+        'rating_confiabilidade': RATINGS,
+        'tipo_solo': solos,
+    })
+    return {"chuva": faixa_chuva, "i_chuva": i_chuva, "solos": solos, "grade": grade}
 
 # --- INTERFACE LATERAL (PAINEL DE CONTROLE) ---
 with st.sidebar:
@@ -57,10 +125,7 @@ with st.sidebar:
     st.markdown("Ajuste as variáveis para simulação em tempo real.")
     
     def get_options(col, default_list):
-        if not df_base.empty and col in df_base.columns:
-            opts = [str(x).title() for x in df_base[col].unique() if pd.notna(x)]
-            return sorted(opts)
-        return default_list
+        return opcoes_base.get(col) or default_list
 
     cidade_ui = st.selectbox("Localização", get_options('cidade', ['Recife', 'São Paulo']))
     etapa_ui = st.selectbox("Etapa Construtiva", get_options('etapa', ['Fundação', 'Estrutura', 'Acabamento']))
@@ -80,20 +145,20 @@ if pipeline is None or features_order is None:
     st.error("🚨 **Atenção:** Ativos da IA não encontrados na pasta `/models`. Verifique o deploy no GitHub.")
 else:
     try:
-        # Extração de Médias de Contexto do Banco de Dados
-        if not df_base.empty:
-            contexto = df_base[(df_base['cidade'] == cidade_ui.lower()) & (df_base['etapa'] == etapa_ui.lower())]
-            if not contexto.empty:
-                orcamento = contexto['orcamento_estimado'].mean()
-                complexidade = contexto['complexidade_obra'].mean()
-                risco_etapa = contexto['risco_etapa'].mean()
-                taxa_forn = contexto['taxa_insucesso_fornecedor'].mean()
+        # Médias de Contexto (agregado pré-calculado em load_assets: lookup O(1))
+        if contexto_base:
+            contexto = contexto_base.get((cidade_ui.lower(), etapa_ui.lower()))
+            if contexto is not None:
+                orcamento = contexto['orcamento_estimado']
+                complexidade = contexto['complexidade_obra']
+                risco_etapa = contexto['risco_etapa']
+                taxa_forn = contexto['taxa_insucesso_fornecedor']
             else:
                 orcamento, complexidade, risco_etapa, taxa_forn = 12000000.0, 15.0, 5.0, 0.12
         else:
             orcamento, complexidade, risco_etapa, taxa_forn = 10000000.0, 10.0, 4.0, 0.10
 
-        # Montagem do DataFrame de Predição (Contrato com o Modelo)
+        # Montagem da Entrada do Modelo (Contrato com o Modelo)
         input_dict = {
             'orcamento_estimado': float(orcamento),
             'rating_confiabilidade': float(val_rating),
@@ -107,15 +172,20 @@ else:
             'etapa': etapa_ui.lower()
         }
         
-        input_df = pd.DataFrame([input_dict])
-        # Alinha colunas e preenche faltantes (dummy variables do modelo)
-        for col in features_order:
-            if col not in input_df.columns:
-                input_df[col] = 0
-        input_df = input_df[features_order]
+        # Uma única chamada (em cache) cobre predição principal, curvas e heatmaps;
+        # trocar rating/solo reaproveita a grade, só chuva ou contexto recalculam
+        contexto_fixo = tuple(sorted((k, v) for k, v in input_dict.items() if k not in EIXOS_VARRIDOS))
+        solos_grade = tuple(sorted(
+            set(TIPOS_SOLO) | {s.lower() for s in opcoes_base.get('tipo_solo', [])} | {solo_ui.lower()}
+        ))
+        cenarios = analisar_cenarios(VERSAO_MODELO, contexto_fixo, solos_grade, float(val_chuva))
+        grade, solos = cenarios["grade"], cenarios["solos"]
+        i_chuva = cenarios["i_chuva"]
+        i_rating = int(np.searchsorted(RATINGS, float(val_rating)))
+        i_solo = solos.index(solo_ui.lower())
 
         # Execução da Predição
-        pred_dias = float(pipeline.predict(input_df)[0])
+        pred_dias = float(grade[i_chuva, i_rating, i_solo])
         pred_dias = max(0, pred_dias)
 
         # MÉTRICAS PRINCIPAIS
@@ -128,16 +198,19 @@ else:
         with m3:
             # Estimativa de custo de atraso: R$ 5.000,00 por dia (exemplo)
             st.metric("Custo de Oportunidade", f"R$ {pred_dias * 5000:,.2f}")
+        if contexto_base and contexto is not None and 'risco_p50' in contexto:
+            st.caption(
+                f"Histórico {cidade_ui} / {etapa_ui}: {contexto['n']:.0f} registros | "
+                f"atraso real mediano {contexto['risco_p50']:.1f} dias (p90: {contexto['risco_p90']:.1f})"
+            )
 
         st.markdown("### 📈 Análises de Sensibilidade")
         col_a, col_b = st.columns(2)
 
         with col_a:
             st.subheader("Simulação de Chuva vs. Atraso")
-            faixa_chuva = np.linspace(0, 800, 20)
-            # Simulação rápida criando cópias do dataframe
-            sim_chuva = pd.concat([input_df.assign(nivel_chuva=c) for c in faixa_chuva])
-            preds_chuva = pipeline.predict(sim_chuva)
+            faixa_chuva = cenarios["chuva"]
+            preds_chuva = grade[:, i_rating, i_solo]
             
             fig_chuva = px.line(x=faixa_chuva, y=preds_chuva, 
                                labels={'x': 'Nível de Chuva (mm)', 'y': 'Dias de Atraso'},
@@ -147,18 +220,77 @@ else:
 
         with col_b:
             st.subheader("Impacto por Geologia")
-            tipos_solo = ['arenoso', 'argiloso', 'rochoso', 'siltoso']
-            # Simulação por categoria de solo
-            sim_solo = pd.concat([input_df.assign(tipo_solo=s) for s in tipos_solo])
-            preds_solo = pipeline.predict(sim_solo)
+            preds_solo = grade[i_chuva, i_rating, :]
             
-            fig_solo = px.bar(x=[s.title() for s in tipos_solo], y=preds_solo,
+            fig_solo = px.bar(x=[s.title() for s in solos], y=preds_solo,
                              labels={'x': 'Geologia', 'y': 'Atraso Estimado'},
                              color=preds_solo, color_continuous_scale='Greens')
             st.plotly_chart(fig_solo, use_container_width=True)
 
+        col_c, col_d = st.columns(2)
+
+        with col_c:
+            st.subheader(f"Mapa de Calor: Chuva × Rating ({solo_ui})")
+            fig_rating = px.imshow(
+                grade[:, :, i_solo].T, x=faixa_chuva, y=RATINGS.astype(int), origin='lower', aspect='auto',
+                labels={'x': 'Nível de Chuva (mm)', 'y': 'Rating do Fornecedor', 'color': 'Dias'},
+                color_continuous_scale='Greens'
+            )
+            st.plotly_chart(fig_rating, use_container_width=True)
+
+        with col_d:
+            st.subheader(f"Mapa de Calor: Chuva × Geologia (rating {val_rating})")
+            fig_geo = px.imshow(
+                grade[:, i_rating, :].T, x=faixa_chuva, y=[s.title() for s in solos], aspect='auto',
+                labels={'x': 'Nível de Chuva (mm)', 'y': 'Geologia', 'color': 'Dias'},
+                color_continuous_scale='Greens'
+            )
+            st.plotly_chart(fig_geo, use_container_width=True)
+
         st.success(f"📌 **Insight Técnico:** A combinação de solo **{solo_ui}** com previsão de **{val_chuva}mm** de chuva indica atenção especial na etapa de **{etapa_ui}**.")
 
+        # PAINEL DE EXPLICABILIDADE (artefato offline: só leitura e plot)
+        st.markdown("### 🔍 Explicabilidade do Modelo")
+        if explicabilidade is None:
+            st.info("Artefato de explicabilidade ausente ou de outra versão do modelo. "
+                    "Gere com `python scripts/explicabilidade.py`.")
+        else:
+            st.caption(f"Modelo `{explicabilidade['versao_modelo']}` | amostra de "
+                       f"{explicabilidade['n_amostra']} linhas | {explicabilidade['metrica']}")
+            col_e, col_f = st.columns(2)
+
+            with col_e:
+                st.subheader("Importância por Permutação")
+                imp = pd.DataFrame(explicabilidade["importancia"]).sort_values("importancia")
+                fig_imp = px.bar(imp, x="importancia", y="feature", error_x="desvio", orientation="h",
+                                 labels={'importancia': 'Aumento do MAE (dias)', 'feature': ''},
+                                 template="plotly_white")
+                fig_imp.update_traces(marker_color='#2E7D32')
+                st.plotly_chart(fig_imp, use_container_width=True)
+
+            with col_f:
+                st.subheader("Dependência Parcial")
+                feat_pd = st.selectbox("Variável", explicabilidade["features"], key="feature_pd")
+                curva = explicabilidade["dependencia_parcial"][feat_pd]
+                if curva["tipo"] == "num":
+                    fig_pd = px.line(x=curva["x"], y=curva["y"], markers=True, template="plotly_white",
+                                     labels={'x': feat_pd, 'y': 'Atraso Médio Previsto (dias)'})
+                    fig_pd.add_scatter(x=curva["x"], y=curva["p10"], mode="lines", name="p10",
+                                       line=dict(dash="dot", color="#A5D6A7"))
+                    fig_pd.add_scatter(x=curva["x"], y=curva["p90"], mode="lines", name="p90",
+                                       line=dict(dash="dot", color="#A5D6A7"))
+                else:
+                    fig_pd = px.bar(x=[str(v).title() for v in curva["x"]], y=curva["y"], template="plotly_white",
+                                    labels={'x': feat_pd, 'y': 'Atraso Médio Previsto (dias)'})
+                st.plotly_chart(fig_pd, use_container_width=True)
+
+            if explicabilidade["importancia_por_etapa"]:
+                st.subheader("Importância por Etapa")
+                por_etapa = pd.DataFrame(explicabilidade["importancia_por_etapa"]).reindex(explicabilidade["features"])
+                fig_etapa = px.imshow(por_etapa.T, aspect='auto', color_continuous_scale='Greens',
+                                      labels={'x': 'Variável', 'y': 'Etapa', 'color': 'Aumento do MAE'})
+                st.plotly_chart(fig_etapa, use_container_width=True)
+
     except Exception as e:
         st.error(f"Erro no processamento da IA: {e}")
 
@@ -0,0 +1,122 @@
+"""
+Camada assíncrona de preferências - CCBJJ Engenharia
+Mesma API de database.py, porém awaitable, para não bloquear o event loop do bot:
+- Postgres: engine assíncrono do SQLAlchemy (driver asyncpg);
+- SQLite local: funções síncronas de database.py executadas via asyncio.to_thread.
+O cache de preferências é compartilhado com database.py.
+"""
+
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+import database
+from database import (
+    QUERY_CREATE_USERS, QUERY_GET_SETTINGS, QUERY_SET_LANGUAGE, QUERY_SET_STORAGE_MODE,
+    DEFAULT_LANGUAGE, DEFAULT_STORAGE_MODE,
+)
+
+logger = logging.getLogger(__name__)
+
+IS_POSTGRES = database.IS_POSTGRES
+_ASYNC_ENGINE = None
+_SCHEMA_PRONTO = False  # CREATE TABLE IF NOT EXISTS feito no primeiro uso (Postgres)
+
+
+def _get_async_engine():
+    """Cria o engine assíncrono sob demanda (dentro do event loop em execução)."""
+    global _ASYNC_ENGINE
+    if _ASYNC_ENGINE is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+        url = database.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+        _ASYNC_ENGINE = create_async_engine(url, pool_size=5, max_overflow=10, pool_pre_ping=True)
+    return _ASYNC_ENGINE
+
+
+async def _execute_query(query: str, params: dict, fetch: bool = False):
+    """Execução assíncrona (Postgres) com a mesma semântica de database._execute_query."""
+    global _SCHEMA_PRONTO
+    engine = _get_async_engine()
+    if not _SCHEMA_PRONTO:
+        async with engine.begin() as conn:
+            await conn.execute(text(QUERY_CREATE_USERS))
+        _SCHEMA_PRONTO = True
+    if fetch:
+        async with engine.connect() as conn:
+            result = await conn.execute(text(query), params)
+            return result.fetchall()
+    async with engine.begin() as conn:
+        await conn.execute(text(query), params)
+
+
+def _now_utc_naive():
+    # asyncpg rejeita datetime com tz em colunas TIMESTAMP (sem fuso); gravamos UTC "naive"
+    return database._now_utc().replace(tzinfo=None)
+
+
+async def init_db():
+    """Cria tabela users com timestamps."""
+    if not IS_POSTGRES:
+        return await asyncio.to_thread(database.init_db)
+    try:
+        await _execute_query(QUERY_CREATE_USERS, {})
+        logger.info("DB Postgres (async) inicializado com sucesso.")
+    except Exception:
+        logger.exception("Erro crítico na inicialização do DB")
+
+
+async def get_user_settings(user_id: int) -> dict:
+    """Idioma e modo numa única consulta, com cache em memória (TTL)."""
+    cached = database._cached_settings(user_id)
+    if cached is not None:
+        return cached
+    if not IS_POSTGRES:
+        return await asyncio.to_thread(database.get_user_settings, user_id)
+    geracao = database._settings_geracao(user_id)
+    try:
+        rows = await _execute_query(QUERY_GET_SETTINGS, {"id": user_id}, fetch=True)
+    except Exception:
+        logger.exception(f"Falha ao obter preferências para {user_id}")
+        return {"language": DEFAULT_LANGUAGE, "storage_mode": DEFAULT_STORAGE_MODE}
+    return database._store_settings(user_id, rows, geracao)
+
+
+async def get_language(user_id: int) -> str:
+    """Retorna idioma ou 'pt'."""
+    return (await get_user_settings(user_id))["language"]
+
+
+async def get_storage_mode(user_id: int) -> str:
+    """Retorna modo ou 'SUPABASE'."""
+    return (await get_user_settings(user_id))["storage_mode"]
+
+
+async def set_language(user_id: int, lang: str):
+    """Upsert de idioma com updated_at (UTC)."""
+    if not IS_POSTGRES:
+        return await asyncio.to_thread(database.set_language, user_id, lang)
+    params = {"id": user_id, "lang": lang, "now": _now_utc_naive()}
+    try:
+        await _execute_query(QUERY_SET_LANGUAGE, params)
+    finally:
+        database._invalidate_settings(user_id)
+
+
+async def set_storage_mode(user_id: int, mode: str):
+    """Upsert de modo com updated_at (UTC)."""
+    if not IS_POSTGRES:
+        return await asyncio.to_thread(database.set_storage_mode, user_id, mode)
+    params = {"id": user_id, "mode": mode, "now": _now_utc_naive()}
+    try:
+        await _execute_query(QUERY_SET_STORAGE_MODE, params)
+    finally:
+        database._invalidate_settings(user_id)
+
+
+async def dispose():
+    """Fecha o pool assíncrono (usar no shutdown da aplicação)."""
+    global _ASYNC_ENGINE
+    if _ASYNC_ENGINE is not None:
+        await _ASYNC_ENGINE.dispose()
+        _ASYNC_ENGINE = None
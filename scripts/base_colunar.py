@@ -0,0 +1,173 @@
+"""
+Base Colunar - CCBJJ Engenharia
+Exporta df_mestre_consolidado.csv.gz para Parquet tipado (dicionários para as colunas
+categóricas) e carrega apenas as colunas necessárias, opcionalmente via memory-map.
+
+Uso:
+    python scripts/base_colunar.py            # gera data/processed/df_mestre_consolidado.parquet
+"""
+
+import os
+import time
+import logging
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+CSV_PATH = BASE_DIR / "data" / "processed" / "df_mestre_consolidado.csv.gz"
+PARQUET_PATH = BASE_DIR / "data" / "processed" / "df_mestre_consolidado.parquet"
+
+# Colunas de baixa cardinalidade gravadas como dictionary (categorical no pandas)
+CATEGORICAS = ["cidade", "tipo_solo", "material", "etapa"]
+MEMORY_MAP = os.getenv("BASE_MEMORY_MAP", "1") == "1"
+
+
+def _schema_arrow(amostra: pd.DataFrame):
+    """Schema fixo para todos os row groups: dictionary nas categóricas, tipos do CSV no resto."""
+    import pyarrow as pa
+    schema = pa.Schema.from_pandas(amostra, preserve_index=False)
+    for col in CATEGORICAS:
+        if col in amostra.columns:
+            schema = schema.set(schema.get_field_index(col), pa.field(col, pa.dictionary(pa.int32(), pa.string())))
+    return schema
+
+
+def exportar_parquet(csv_path=CSV_PATH, parquet_path=PARQUET_PATH, chunk_size: int = 250_000) -> int:
+    """Converte o CSV.gz em Parquet em streaming (um row group por lote)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    inicio = time.perf_counter()
+    total, writer = 0, None
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+            if writer is None:
+                schema = _schema_arrow(chunk)
+                writer = pq.ParquetWriter(str(parquet_path), schema, compression="zstd")
+            tabela = pa.Table.from_pandas(chunk, preserve_index=False).cast(schema)
+            writer.write_table(tabela)
+            total += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    logger.info(f"✅ {total} linhas exportadas para {parquet_path} em {time.perf_counter() - inicio:.2f}s")
+    return total
+
+
+def carregar_base(colunas=None, parquet_path=PARQUET_PATH, csv_path=CSV_PATH, memory_map: bool = MEMORY_MAP) -> pd.DataFrame:
+    """
+    Lê só as colunas pedidas. Prefere o Parquet (projeção real de colunas + memory-map);
+    sem Parquet/pyarrow, cai para o CSV com usecols.
+    """
+    colunas = list(dict.fromkeys(colunas)) if colunas else None
+    if Path(parquet_path).exists():
+        try:
+            import pyarrow.parquet as pq
+            disponiveis = set(pq.read_schema(str(parquet_path)).names)
+            cols = [c for c in colunas if c in disponiveis] if colunas else None
+            tabela = pq.read_table(str(parquet_path), columns=cols, memory_map=memory_map)
+            return tabela.to_pandas()
+        except ImportError:
+            logger.warning("pyarrow indisponível; usando CSV.")
+
+    if not Path(csv_path).exists():
+        return pd.DataFrame()
+    usecols = (lambda c: c in colunas) if colunas else None
+    df = pd.read_csv(csv_path, usecols=usecols)
+    for col in CATEGORICAS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+def compactar_colunas(df: pd.DataFrame, float32: bool = True, preservar=()) -> pd.DataFrame:
+    """
+    Categóricas nas colunas de baixa cardinalidade e numéricos no menor tipo suficiente.
+    Colunas em `preservar` (entradas do modelo) ficam em float64: com imputer+StandardScaler
+    o arredondamento para float32 muda predições (ex.: orcamento_estimado 21033204.23 ->
+    21033204.0), e o modo CSV/Parquet divergiria do Supabase (float64) para a mesma obra.
+    """
+    df = df.copy()
+    preservar = set(preservar)
+    for col in df.columns:
+        serie = df[col]
+        if col in CATEGORICAS and not isinstance(serie.dtype, pd.CategoricalDtype):
+            df[col] = serie.astype("category")
+        elif pd.api.types.is_integer_dtype(serie):
+            df[col] = pd.to_numeric(serie, downcast="integer")
+        elif pd.api.types.is_float_dtype(serie) and float32 and col not in preservar:
+            df[col] = serie.astype(np.float32)
+    return df
+
+
+class BaseCompacta:
+    """
+    Base em memória com IDs internados: linhas ordenadas por obra, coluna obra_code (int32)
+    no lugar da string repetida por etapa e um array de offsets (linhas da obra i em
+    offsets[i]:offsets[i + 1]). Compatível com o índice dict (get/items) usado pelo bot.
+    """
+
+    def __init__(self, df: pd.DataFrame, id_col: str = "id_obra", float32: bool = True, preservar=()):
+        chaves = df[id_col].astype(str).str.strip().str.upper()
+        codes, ids = pd.factorize(chaves, sort=False)
+        ordem = np.argsort(codes, kind="stable")
+        compacta = compactar_colunas(df.drop(columns=[id_col]), float32=float32, preservar=preservar).iloc[ordem]
+        compacta.insert(0, "obra_code", codes[ordem].astype(np.int32))
+        self.df = compacta.reset_index(drop=True)
+        self.ids = np.asarray(ids, dtype=object)
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(ids))))).astype(np.int64)
+        self.codigo = {obra: i for i, obra in enumerate(self.ids)}
+
+    def get(self, id_obra: str, default=None):
+        """Fatia contígua das etapas da obra (ou default)."""
+        i = self.codigo.get(id_obra)
+        if i is None:
+            return default
+        return slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def items(self):
+        for i, obra in enumerate(self.ids):
+            yield obra, slice(int(self.offsets[i]), int(self.offsets[i + 1]))
+
+    def linhas(self, id_obra: str) -> pd.DataFrame:
+        fatia = self.get(id_obra)
+        return self.df.iloc[0:0] if fatia is None else self.df.iloc[fatia]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def memoria_bytes(self) -> int:
+        ids_bytes = sum(len(o) + 49 for o in self.ids)  # aproximação do custo de str no CPython
+        return int(self.df.memory_usage(deep=True).sum() + self.offsets.nbytes + ids_bytes
+                   + 2 * (len(self.codigo) * 8))
+
+
+def relatorio_memoria(original: pd.DataFrame, compacta: "BaseCompacta") -> dict:
+    """Memória (deep) da base original vs. compacta, por coluna e total."""
+    antes = original.memory_usage(deep=True, index=False)
+    depois = compacta.df.memory_usage(deep=True, index=False)
+    relatorio = {
+        "linhas": len(original),
+        "obras": len(compacta),
+        "antes_mb": antes.sum() / 1e6,
+        "depois_mb": compacta.memoria_bytes() / 1e6,
+        "por_coluna_mb": {
+            col: (antes.get(col, 0) / 1e6, depois.get(col, 0) / 1e6)
+            for col in dict.fromkeys(list(antes.index) + list(depois.index))
+        },
+    }
+    relatorio["reducao"] = relatorio["antes_mb"] / max(relatorio["depois_mb"], 1e-9)
+    logger.info(
+        f"🧮 Base em memória: {relatorio['antes_mb']:.2f} MB -> {relatorio['depois_mb']:.2f} MB "
+        f"({relatorio['reducao']:.1f}x) | {relatorio['linhas']} linhas, {relatorio['obras']} obras"
+    )
+    return relatorio
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    exportar_parquet()
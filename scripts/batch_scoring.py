@@ -0,0 +1,112 @@
+"""
+Scoring em Lote - CCBJJ Engenharia
+Reescora toda a base consolidada em chunks vetorizados distribuídos num pool de processos
+e grava o risco agregado por obra (média, máximo e etapa mais crítica) em Parquet.
+
+Uso:
+    python scripts/batch_scoring.py --workers 4 --chunksize 50000
+"""
+
+import os
+import time
+import logging
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import pandas as pd
+
+from inference_engine import carregar_pipeline_worker
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PIPELINE_PATH = BASE_DIR / "models" / "pipeline_random_forest.pkl"
+FEATURES_PATH = BASE_DIR / "models" / "features_metadata.joblib"
+INPUT_PATH = BASE_DIR / "data" / "processed" / "df_mestre_consolidado.csv.gz"
+OUTPUT_PATH = BASE_DIR / "data" / "processed" / "scores_obras.parquet"
+
+# Estado por processo (carregado uma vez no initializer de cada worker)
+_WORKER = {"pipeline": None, "features": None}
+
+
+def _init_worker(pipeline_path, features_path):
+    _WORKER["pipeline"] = carregar_pipeline_worker(pipeline_path)
+    _WORKER["features"] = joblib.load(features_path)
+
+
+def pontuar_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Predição vetorizada de um chunk -> parciais por obra (soma, contagem, máximo, etapa do máximo)."""
+    X = chunk.reindex(columns=_WORKER["features"], fill_value=0)
+    risco = _WORKER["pipeline"].predict(X)
+    parciais = pd.DataFrame({
+        "id_obra": chunk["id_obra"].astype(str).str.strip().str.upper().to_numpy(),
+        "soma": risco,
+        "n": 1,
+        "risco_max": risco,
+        "pior_etapa": chunk["etapa"].to_numpy() if "etapa" in chunk.columns else None,
+    })
+    return agregar_parciais(parciais)
+
+
+def agregar_parciais(parciais: pd.DataFrame) -> pd.DataFrame:
+    """Combina parciais (associativo): obras que cruzam a fronteira entre chunks são somadas corretamente."""
+    parciais = parciais.sort_values("risco_max", ascending=False, kind="stable")
+    agg = parciais.groupby("id_obra", sort=False).agg(
+        soma=("soma", "sum"), n=("n", "sum"),
+        risco_max=("risco_max", "first"), pior_etapa=("pior_etapa", "first"),
+    )
+    return agg.reset_index()
+
+
+def pontuar_base(input_path=INPUT_PATH, output_path=OUTPUT_PATH, chunksize: int = 50_000, workers: int = None):
+    """Lê a base em streaming, pontua em paralelo e grava o agregado por obra."""
+    workers = workers or os.cpu_count() or 1
+    inicio = time.perf_counter()
+    total_linhas = 0
+    parciais = []
+
+    leitor = pd.read_csv(input_path, chunksize=chunksize)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(str(PIPELINE_PATH), str(FEATURES_PATH))) as pool:
+        # Janela limitada de chunks em voo: mantém a memória estável em bases grandes
+        em_voo = []
+        for chunk in leitor:
+            total_linhas += len(chunk)
+            em_voo.append(pool.submit(pontuar_chunk, chunk))
+            if len(em_voo) >= workers * 2:
+                parciais.append(em_voo.pop(0).result())
+        parciais.extend(f.result() for f in em_voo)
+
+    if not parciais:
+        logging.warning(f"Nenhuma linha encontrada em {input_path}")
+        return pd.DataFrame()
+
+    resultado = agregar_parciais(pd.concat(parciais, ignore_index=True))
+    resultado["risco_medio"] = resultado["soma"] / resultado["n"]
+    resultado = resultado.rename(columns={"n": "n_etapas"})[
+        ["id_obra", "risco_medio", "risco_max", "pior_etapa", "n_etapas"]
+    ].sort_values("risco_medio", ascending=False, ignore_index=True)
+    resultado.to_parquet(output_path, index=False)
+
+    duracao = time.perf_counter() - inicio
+    logging.info(
+        f"✅ {total_linhas} linhas / {len(resultado)} obras pontuadas em {duracao:.2f}s "
+        f"({total_linhas / max(duracao, 1e-9):,.0f} linhas/s, {workers} workers) -> {output_path}"
+    )
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring em lote da base consolidada CCBJJ.")
+    parser.add_argument("--input", default=str(INPUT_PATH))
+    parser.add_argument("--output", default=str(OUTPUT_PATH))
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    pontuar_base(args.input, args.output, args.chunksize, args.workers)
+
+
+if __name__ == "__main__":
+    main()
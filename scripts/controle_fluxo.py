@@ -0,0 +1,91 @@
+"""
+Controle de Fluxo - CCBJJ Engenharia
+- CoalescedorRequisicoes: requisições concorrentes com a mesma chave compartilham uma
+  única execução em andamento (a primeira lidera, as demais aguardam o mesmo resultado);
+- LimitadorTokenBucket: limite por usuário (rajada + taxa de reposição), para que uma
+  rajada de mensagens não sature a CPU do dyno.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Limites configuráveis via ambiente
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "5"))          # tokens no balde cheio
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "12"))  # reposição
+RATE_LIMIT_MAX_USERS = int(os.getenv("RATE_LIMIT_MAX_USERS", "10000"))   # baldes em memória
+
+
+class CoalescedorRequisicoes:
+    """Uma tarefa em andamento por chave; a chave é liberada quando a tarefa termina."""
+
+    def __init__(self):
+        self._em_andamento = {}
+        self.lideres = 0
+        self.seguidores = 0
+
+    async def executar(self, chave, fabrica):
+        """fabrica() -> coroutine; só é chamada se não houver execução em andamento."""
+        tarefa = self._em_andamento.get(chave)
+        if tarefa is None:
+            self.lideres += 1
+            tarefa = asyncio.ensure_future(fabrica())
+            self._em_andamento[chave] = tarefa
+            tarefa.add_done_callback(lambda _t, k=chave: self._em_andamento.pop(k, None))
+        else:
+            self.seguidores += 1
+        # shield: o cancelamento de um chamador não cancela o resultado dos demais
+        return await asyncio.shield(tarefa)
+
+    def stats(self) -> dict:
+        return {"em_andamento": len(self._em_andamento), "lideres": self.lideres, "seguidores": self.seguidores}
+
+
+class LimitadorTokenBucket:
+    """Token bucket por usuário: `capacidade` requisições em rajada, `por_minuto` sustentadas."""
+
+    def __init__(self, capacidade: float = RATE_LIMIT_BURST, por_minuto: float = RATE_LIMIT_PER_MINUTE,
+                 max_usuarios: int = RATE_LIMIT_MAX_USERS):
+        self.capacidade = capacidade
+        self.taxa = por_minuto / 60.0
+        self.max_usuarios = max_usuarios
+        self._baldes = {}  # user_id -> (tokens, atualizado_em)
+        self._lock = threading.Lock()
+        self.negadas = 0
+
+    def permitir(self, user_id, custo: float = 1.0) -> bool:
+        agora = time.monotonic()
+        with self._lock:
+            tokens, ultimo = self._baldes.get(user_id, (self.capacidade, agora))
+            tokens = min(self.capacidade, tokens + (agora - ultimo) * self.taxa)
+            permitido = tokens >= custo
+            if permitido:
+                tokens -= custo
+            else:
+                self.negadas += 1
+            self._baldes[user_id] = (tokens, agora)
+            if len(self._baldes) > self.max_usuarios:
+                self._podar(agora)
+            return permitido
+
+    def espera_segundos(self, user_id, custo: float = 1.0) -> float:
+        """Tempo até haver tokens suficientes (0 se já pode)."""
+        with self._lock:
+            tokens, ultimo = self._baldes.get(user_id, (self.capacidade, time.monotonic()))
+        tokens = min(self.capacidade, tokens + (time.monotonic() - ultimo) * self.taxa)
+        return max(0.0, (custo - tokens) / self.taxa) if self.taxa > 0 else float("inf")
+
+    def _podar(self, agora: float):
+        """Remove baldes que já estariam cheios (usuários ociosos não precisam de estado)."""
+        cheio_em = self.capacidade / self.taxa if self.taxa > 0 else float("inf")
+        for user_id in [u for u, (_, t) in self._baldes.items() if agora - t >= cheio_em]:
+            del self._baldes[user_id]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"usuarios": len(self._baldes), "negadas": self.negadas,
+                    "capacidade": self.capacidade, "por_minuto": self.taxa * 60}
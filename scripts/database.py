@@ -1,6 +1,8 @@
 import os
+import time
 import logging
 import sqlite3
+import threading
 from pathlib import Path
 from datetime import datetime, timezone
 from sqlalchemy import create_engine, text
@@ -22,82 +24,158 @@ else:
     DB_PATH = BASE_DIR / "users.db"
     IS_POSTGRES = False
 
+DEFAULT_LANGUAGE = "pt"
+DEFAULT_STORAGE_MODE = "SUPABASE"
+
+# Conexão SQLite persistente (WAL), compartilhada entre threads sob lock
+_SQLITE_CONN = None
+_SQLITE_LOCK = threading.RLock()
+# Schema criado sob demanda no primeiro uso (Postgres); init_db() no startup é só aquecimento
+_SCHEMA_PRONTO = False
+
+# Cache read-through das preferências: user_id -> (expira_em, settings)
+SETTINGS_CACHE_TTL = float(os.getenv("SETTINGS_CACHE_TTL", "300"))
+_SETTINGS_CACHE = {}
+# Geração por usuário (incrementada a cada escrita): leitura iniciada antes de um set_*
+# não grava no cache o valor antigo que leu
+_SETTINGS_GERACAO = {}
+_SETTINGS_LOCK = threading.Lock()
+
+# Consultas compartilhadas com async_database
+QUERY_CREATE_USERS = """
+    CREATE TABLE IF NOT EXISTS users (
+        user_id BIGINT PRIMARY KEY,
+        language TEXT DEFAULT 'pt',
+        storage_mode TEXT DEFAULT 'SUPABASE',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+"""
+QUERY_GET_SETTINGS = "SELECT language, storage_mode FROM users WHERE user_id = :id"
+QUERY_SET_LANGUAGE = """
+    INSERT INTO users (user_id, language, updated_at)
+    VALUES (:id, :lang, :now)
+    ON CONFLICT (user_id) DO UPDATE
+    SET language = EXCLUDED.language,
+        updated_at = EXCLUDED.updated_at;
+"""
+QUERY_SET_STORAGE_MODE = """
+    INSERT INTO users (user_id, storage_mode, updated_at)
+    VALUES (:id, :mode, :now)
+    ON CONFLICT (user_id) DO UPDATE
+    SET storage_mode = EXCLUDED.storage_mode,
+        updated_at = EXCLUDED.updated_at;
+"""
+
+def _get_sqlite_conn() -> sqlite3.Connection:
+    """Abre uma única vez a conexão SQLite em modo WAL (leituras não bloqueiam escritas)."""
+    global _SQLITE_CONN
+    with _SQLITE_LOCK:
+        if _SQLITE_CONN is None:
+            conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Tabela criada junto com a conexão: funciona qualquer que seja o ponto de entrada
+            conn.execute(QUERY_CREATE_USERS)
+            conn.commit()
+            _SQLITE_CONN = conn
+        return _SQLITE_CONN
+
+def _garantir_schema():
+    """CREATE TABLE IF NOT EXISTS uma única vez por processo (idempotente)."""
+    global _SCHEMA_PRONTO
+    if _SCHEMA_PRONTO:
+        return
+    if IS_POSTGRES:
+        # Transacional
+        with engine.begin() as conn:
+            conn.execute(text(QUERY_CREATE_USERS))
+    else:
+        _get_sqlite_conn()
+    _SCHEMA_PRONTO = True
+
 def init_db():
-    """Cria tabela users com timestamps."""
-    query_users = """
-        CREATE TABLE IF NOT EXISTS users (
-            user_id BIGINT PRIMARY KEY,
-            language TEXT DEFAULT 'pt',
-            storage_mode TEXT DEFAULT 'SUPABASE',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        );
-    """
+    """Cria tabela users com timestamps (aquecimento no startup; o primeiro uso também cria)."""
     try:
-        if IS_POSTGRES:
-            # Transacional
-            with engine.begin() as conn:
-                conn.execute(text(query_users))
-            logging.info("DB Postgres inicializado com sucesso.")
-        else:
-            # SQLite com placeholders nomeados
-            with sqlite3.connect(DB_PATH) as conn:
-                conn.execute(query_users)
-            logging.info("DB SQLite inicializado com sucesso.")
+        _garantir_schema()
+        logging.info(f"DB {'Postgres' if IS_POSTGRES else 'SQLite'} inicializado com sucesso.")
     except Exception as e:
         logging.exception("Erro crítico na inicialização do DB")
 
 def _now_utc():
     return datetime.now(timezone.utc)
 
+def _invalidate_settings(user_id: int):
+    with _SETTINGS_LOCK:
+        _SETTINGS_CACHE.pop(user_id, None)
+        _SETTINGS_GERACAO[user_id] = _SETTINGS_GERACAO.get(user_id, 0) + 1
+
+def _settings_geracao(user_id: int) -> int:
+    """Geração atual do usuário; capturada ANTES da consulta e repassada a _store_settings."""
+    with _SETTINGS_LOCK:
+        return _SETTINGS_GERACAO.get(user_id, 0)
+
+def _cached_settings(user_id: int):
+    """Retorna cópia das preferências em cache ou None se ausente/expirada."""
+    with _SETTINGS_LOCK:
+        item = _SETTINGS_CACHE.get(user_id)
+        if item is not None and item[0] > time.monotonic():
+            return dict(item[1])
+    return None
+
+def _store_settings(user_id: int, rows, geracao: int) -> dict:
+    """Converte o resultado da consulta (com defaults) e grava no cache se nenhuma escrita ocorreu desde a leitura."""
+    settings = {
+        "language": (rows[0][0] if rows else None) or DEFAULT_LANGUAGE,
+        "storage_mode": (rows[0][1] if rows else None) or DEFAULT_STORAGE_MODE,
+    }
+    with _SETTINGS_LOCK:
+        if _SETTINGS_GERACAO.get(user_id, 0) == geracao:
+            _SETTINGS_CACHE[user_id] = (time.monotonic() + SETTINGS_CACHE_TTL, settings)
+    return dict(settings)
+
+def get_user_settings(user_id: int) -> dict:
+    """Idioma e modo numa única consulta, com cache em memória (TTL)."""
+    cached = _cached_settings(user_id)
+    if cached is not None:
+        return cached
+    geracao = _settings_geracao(user_id)
+    try:
+        rows = _execute_query(QUERY_GET_SETTINGS, {"id": user_id}, fetch=True)
+    except Exception:
+        logging.exception(f"Falha ao obter preferências para {user_id}")
+        return {"language": DEFAULT_LANGUAGE, "storage_mode": DEFAULT_STORAGE_MODE}
+    return _store_settings(user_id, rows, geracao)
+
 def set_language(user_id: int, lang: str):
     """Upsert de idioma com updated_at (UTC)."""
-    query = """
-        INSERT INTO users (user_id, language, updated_at)
-        VALUES (:id, :lang, :now)
-        ON CONFLICT (user_id) DO UPDATE
-        SET language = EXCLUDED.language,
-            updated_at = EXCLUDED.updated_at;
-    """
     params = {"id": user_id, "lang": lang, "now": _now_utc()}
-    _execute_query(query, params)
+    try:
+        _execute_query(QUERY_SET_LANGUAGE, params)
+    finally:
+        _invalidate_settings(user_id)
 
 def get_language(user_id: int) -> str:
     """Retorna idioma ou 'pt'."""
-    query = "SELECT language FROM users WHERE user_id = :id"
-    try:
-        rows = _execute_query(query, {"id": user_id}, fetch=True)
-        return rows[0][0] if rows else "pt"
-    except Exception:
-        logging.exception(f"Falha ao obter idioma para {user_id}")
-        return "pt"
+    return get_user_settings(user_id)["language"]
 
 def set_storage_mode(user_id: int, mode: str):
     """Upsert de modo com updated_at (UTC)."""
-    query = """
-        INSERT INTO users (user_id, storage_mode, updated_at)
-        VALUES (:id, :mode, :now)
-        ON CONFLICT (user_id) DO UPDATE
-        SET storage_mode = EXCLUDED.storage_mode,
-            updated_at = EXCLUDED.updated_at;
-    """
     params = {"id": user_id, "mode": mode, "now": _now_utc()}
-    _execute_query(query, params)
+    try:
+        _execute_query(QUERY_SET_STORAGE_MODE, params)
+    finally:
+        _invalidate_settings(user_id)
 
 def get_storage_mode(user_id: int) -> str:
     """Retorna modo ou 'SUPABASE'."""
-    query = "SELECT storage_mode FROM users WHERE user_id = :id"
-    try:
-        rows = _execute_query(query, {"id": user_id}, fetch=True)
-        return rows[0][0] if rows else "SUPABASE"
-    except Exception:
-        logging.exception(f"Falha ao obter modo para {user_id}")
-        return "SUPABASE"
+    return get_user_settings(user_id)["storage_mode"]
 
 def _execute_query(query: str, params: dict, fetch: bool = False):
     """Execução abstrata para Postgres/SQLite com parametrização correta."""
     if IS_POSTGRES:
         try:
+            _garantir_schema()
             if fetch:
                 with engine.connect() as conn:
                     result = conn.execute(text(query), params)
@@ -110,16 +188,18 @@ def _execute_query(query: str, params: dict, fetch: bool = False):
             logging.exception("Erro SQLAlchemy")
             raise
     else:
-        try:
-            with sqlite3.connect(DB_PATH) as conn:
+        with _SQLITE_LOCK:
+            conn = _get_sqlite_conn()
+            try:
                 # Usa placeholders nomeados (:id, :lang) diretamente
                 cur = conn.execute(query, params)
                 if fetch:
                     return cur.fetchall()
                 conn.commit()
-        except sqlite3.Error:
-            logging.exception("Erro SQLite")
-            raise
+            except sqlite3.Error:
+                conn.rollback()
+                logging.exception("Erro SQLite")
+                raise
 
-# Inicialização
-init_db()
+# Inicialização: preguiçosa no primeiro uso (_garantir_schema / _get_sqlite_conn); o lifespan
+# do bot chama init_db() apenas para aquecer a conexão no startup, não no import
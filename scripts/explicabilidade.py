@@ -0,0 +1,167 @@
+"""
+Explicabilidade Offline - CCBJJ Engenharia
+Calcula, uma vez por versão do modelo, as curvas de dependência parcial (PD), as
+importâncias por permutação (geral e por etapa) de todas as features de
+features_metadata.joblib, em paralelo, e grava um artefato versionado com o fingerprint
+do .pkl. O dashboard só lê o artefato (renderização instantânea).
+
+Uso:
+    python scripts/explicabilidade.py --workers 4 --amostra 20000
+"""
+
+import os
+import time
+import logging
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from base_colunar import carregar_base
+from inference_engine import carregar_pipeline_worker
+from prediction_cache import fingerprint_modelo
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PIPELINE_PATH = BASE_DIR / "models" / "pipeline_random_forest.pkl"
+FEATURES_PATH = BASE_DIR / "models" / "features_metadata.joblib"
+OUTPUT_PATH = BASE_DIR / "models" / "explicabilidade.joblib"
+CSV_PATH = BASE_DIR / "data" / "processed" / "df_mestre_consolidado.csv.gz"
+
+ALVO = "risco_etapa"
+AMOSTRA = 20_000     # linhas usadas nas PDs/permutações (estimativas estáveis, custo limitado)
+PONTOS_GRADE = 20    # pontos por curva numérica (quantis da base)
+REPETICOES = 5       # repetições da permutação por feature
+SEED = 42
+
+# Estado por processo (carregado uma vez no initializer de cada worker)
+_WORKER = {"pipeline": None, "X": None}
+
+
+def _init_worker(pipeline_path, X):
+    _WORKER["pipeline"] = carregar_pipeline_worker(pipeline_path)
+    _WORKER["X"] = X
+
+
+def grade_feature(serie: pd.Series, pontos: int = PONTOS_GRADE):
+    """Quantis únicos (numérica) ou categorias observadas (categórica)."""
+    if pd.api.types.is_numeric_dtype(serie):
+        return "num", np.unique(np.nanquantile(serie.to_numpy(dtype=float), np.linspace(0, 1, pontos)))
+    return "cat", np.array(sorted(serie.dropna().astype(str).unique()), dtype=object)
+
+
+def dependencia_parcial(feature: str, pontos: int = PONTOS_GRADE) -> dict:
+    """PD (brute force): média da predição com a feature fixada em cada ponto da grade."""
+    X = _WORKER["X"]
+    tipo, grade = grade_feature(X[feature], pontos)
+    # Um único predict em lote: a amostra repetida uma vez por ponto da grade
+    bloco = pd.concat([X] * len(grade), ignore_index=True)
+    bloco[feature] = np.repeat(grade, len(X))
+    preds = _WORKER["pipeline"].predict(bloco).reshape(len(grade), len(X))
+    return {
+        "feature": feature, "tipo": tipo, "x": grade.tolist(),
+        "y": preds.mean(axis=1).tolist(), "p10": np.percentile(preds, 10, axis=1).tolist(),
+        "p90": np.percentile(preds, 90, axis=1).tolist(),
+    }
+
+
+def importancia_permutacao(pipeline, X: pd.DataFrame, y: pd.Series, repeticoes: int, workers: int) -> pd.DataFrame:
+    """Aumento do MAE ao embaralhar cada feature (média e desvio entre repetições)."""
+    from sklearn.inspection import permutation_importance
+
+    resultado = permutation_importance(
+        pipeline, X, y, scoring="neg_mean_absolute_error",
+        n_repeats=repeticoes, random_state=SEED, n_jobs=workers
+    )
+    return pd.DataFrame({
+        "feature": X.columns,
+        "importancia": resultado.importances_mean,
+        "desvio": resultado.importances_std,
+    }).sort_values("importancia", ascending=False, ignore_index=True)
+
+
+def gerar_explicabilidade(pipeline_path=PIPELINE_PATH, features_path=FEATURES_PATH, csv_path=CSV_PATH,
+                          output_path=OUTPUT_PATH, amostra: int = AMOSTRA, pontos: int = PONTOS_GRADE,
+                          repeticoes: int = REPETICOES, workers: int = None) -> dict:
+    workers = workers or os.cpu_count() or 1
+    inicio = time.perf_counter()
+    features = list(joblib.load(features_path))
+    base = carregar_base(features + [ALVO], csv_path=csv_path)
+    if base.empty:
+        raise FileNotFoundError(f"Base não encontrada em {csv_path}")
+    base = base.dropna(subset=[ALVO])
+    if len(base) > amostra:
+        base = base.sample(amostra, random_state=SEED)
+    # Categóricas como texto: mesmo contrato de entrada usado no treino
+    X = base.reindex(columns=features, fill_value=0).reset_index(drop=True)
+    for col in X.columns:
+        if isinstance(X[col].dtype, pd.CategoricalDtype):
+            X[col] = X[col].astype(str)
+    y = base[ALVO].astype(float).reset_index(drop=True)
+
+    # 1. Dependência parcial: uma feature por tarefa no pool de processos
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(str(pipeline_path), X)) as pool:
+        curvas = list(pool.map(dependencia_parcial, features, [pontos] * len(features)))
+    logging.info(f"📈 PD de {len(curvas)} features em {time.perf_counter() - inicio:.1f}s")
+
+    # 2. Importâncias por permutação (geral e por etapa), paralelas entre features
+    pipeline = carregar_pipeline_worker(pipeline_path)
+    geral = importancia_permutacao(pipeline, X, y, repeticoes, workers)
+    por_etapa = {}
+    if "etapa" in X.columns:
+        for etapa, idx in X.groupby("etapa").groups.items():
+            if len(idx) >= 50:
+                por_etapa[str(etapa)] = importancia_permutacao(
+                    pipeline, X.loc[idx], y.loc[idx], repeticoes, workers
+                ).set_index("feature")["importancia"].to_dict()
+
+    artefato = {
+        "versao_modelo": fingerprint_modelo(pipeline_path),
+        "gerado_em": datetime.now(timezone.utc).isoformat(),
+        "n_amostra": len(X),
+        "features": features,
+        "dependencia_parcial": {c["feature"]: c for c in curvas},
+        "importancia": geral.to_dict(orient="records"),
+        "importancia_por_etapa": por_etapa,
+        "metrica": "aumento do MAE (dias) ao permutar a feature",
+    }
+    joblib.dump(artefato, output_path)
+    logging.info(
+        f"✅ Explicabilidade (modelo {artefato['versao_modelo']}) gravada em {output_path} "
+        f"em {time.perf_counter() - inicio:.1f}s ({len(X)} linhas, {workers} workers)"
+    )
+    return artefato
+
+
+def carregar_explicabilidade(pipeline_path=PIPELINE_PATH, path=OUTPUT_PATH):
+    """Artefato se existir e corresponder ao .pkl atual; senão None (job precisa rodar)."""
+    if not Path(path).exists():
+        return None
+    artefato = joblib.load(path)
+    if Path(pipeline_path).exists() and artefato.get("versao_modelo") != fingerprint_modelo(pipeline_path):
+        logging.warning(f"{path} foi gerado para outra versão do modelo; ignorando.")
+        return None
+    return artefato
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PD e importâncias (offline) do modelo CCBJJ.")
+    parser.add_argument("--input", default=str(CSV_PATH))
+    parser.add_argument("--output", default=str(OUTPUT_PATH))
+    parser.add_argument("--amostra", type=int, default=AMOSTRA)
+    parser.add_argument("--pontos", type=int, default=PONTOS_GRADE)
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    gerar_explicabilidade(csv_path=args.input, output_path=args.output, amostra=args.amostra,
+                          pontos=args.pontos, repeticoes=args.repeticoes, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,21 @@
 import pandas as pd
 import numpy as np
 from faker import Faker
-import random
+import argparse
+import time
 import os
 
 # Inicialização
-fake = Faker('pt_BR')
-np.random.seed(42)
-random.seed(42)
+SEED = 42
 
 # Garantir existência das pastas
-os.makedirs('data/raw', exist_ok=True)
+RAW_DIR = 'data/raw'
 
 # Configurações do Ecossistema CCbjj
-NUM_OBRAS = 200  # Aumentado levemente para melhorar a convergência do modelo
+NUM_OBRAS = 200  # Padrão histórico; use --obras para testes de carga em escala de produção
 NUM_FORNECEDORES = 40
+CHUNK_OBRAS = 100_000  # Obras por lote gravado (memória constante em bases grandes)
+NOMES_FAKER = 500  # Pool de nomes do Faker amostrado vetorialmente (Faker é lento por linha)
 
 # 1. Definições de Domínio (Padronizado em Minúsculo)
 cidades = ['recife', 'são paulo', 'manaus', 'rio de janeiro', 'curitiba', 'salvador', 'fortaleza', 'belo horizonte', 'belém', 'porto alegre']
@@ -24,88 +25,143 @@ etapas_materiais = {
     'estrutura': ['aço', 'madeira', 'cimento'],
     'acabamento': ['piso', 'tintas', 'revestimento', 'aço']
 }
+ETAPAS = list(etapas_materiais.keys())
 
-# 2. Gerar Fornecedores
-fornecedores = []
-for i in range(NUM_FORNECEDORES):
-    fornecedores.append({
-        'id_fornecedor': f'FORN-{i+1}', # Padronizado minúsculo no nome da coluna
-        'nome_fornecedor': fake.company(),
-        'rating_confiabilidade': round(random.uniform(1.0, 5.0), 1)
+
+def gerar_fornecedores(rng: np.random.Generator, fake: Faker, n: int) -> pd.DataFrame:
+    """2. Fornecedores com rating uniforme em [1, 5]."""
+    nomes = np.array([fake.company() for _ in range(min(n, NOMES_FAKER))])
+    return pd.DataFrame({
+        'id_fornecedor': [f'FORN-{i + 1}' for i in range(n)],  # Padronizado minúsculo no nome da coluna
+        'nome_fornecedor': nomes[rng.integers(0, len(nomes), n)] if n > len(nomes) else nomes,
+        'rating_confiabilidade': np.round(rng.uniform(1.0, 5.0, n), 1),
     })
-df_fornecedores = pd.DataFrame(fornecedores)
-
-# 3. Gerar Obras
-obras = []
-for i in range(NUM_OBRAS):
-    orcamento = round(random.uniform(5_000_000, 30_000_000), 2)
-    obras.append({
-        'id_obra': f'CCBJJ-{100+i}',
-        'nome_empreendimento': f'Residencial {fake.street_name()}'.title(),
-        'cidade': random.choice(cidades),
-        'tipo_solo': random.choice(tipos_solo),
+
+
+def gerar_obras(rng: np.random.Generator, ruas: np.ndarray, inicio: int, n: int) -> pd.DataFrame:
+    """3. Obras do lote [inicio, inicio + n)."""
+    orcamento = np.round(rng.uniform(5_000_000, 30_000_000, n), 2)
+    hoje = np.datetime64('today', 'D')
+    return pd.DataFrame({
+        'id_obra': [f'CCBJJ-{100 + i}' for i in range(inicio, inicio + n)],
+        'nome_empreendimento': np.char.add('Residencial ', ruas[rng.integers(0, len(ruas), n)]),
+        'cidade': np.array(cidades)[rng.integers(0, len(cidades), n)],
+        'tipo_solo': np.array(tipos_solo)[rng.integers(0, len(tipos_solo), n)],
         'orcamento_estimado': orcamento,
-        'complexidade_obra': np.log1p(orcamento), 
-        'data_inicio_prevista': fake.date_between(start_date='-1y', end_date='today')
+        'complexidade_obra': np.log1p(orcamento),
+        'data_inicio_prevista': hoje - rng.integers(0, 366, n).astype('timedelta64[D]'),
     })
-df_obras = pd.DataFrame(obras)
 
-# 4. Gerar Clima, Atividades e Suprimentos
-clima, atividades, base_consulta = [], [], []
 
+def gerar_atividades(rng: np.random.Generator, df_obras: pd.DataFrame, df_fornecedores: pd.DataFrame):
+    """4. Clima, atividades e base consolidada, vetorizados (uma linha por obra x etapa)."""
+    n = len(df_obras)
+    n_etapas = len(ETAPAS)
 
-
-for idx, obra in df_obras.iterrows():
     # Nível de chuva acumulado (Feature forte para o modelo)
-    chuva_acumulada = random.randint(30, 750)
-    clima.append({'id_obra': obra['id_obra'], 'chuva_mm': chuva_acumulada})
-    
-    for etapa, materiais in etapas_materiais.items():
-        id_atv = f"{obra['id_obra']}_{etapa}"
-        
-        # Seleção de Fornecedor
-        forn = df_fornecedores.sample(1).iloc[0]
-        taxa_insucesso_base = round(random.uniform(0.05, 0.45), 2)
-        
-        # Lógica de Atraso Correlacionada (Regras de Engenharia)
-        risco_base = 3.0
-        if etapa == 'fundação' and obra['tipo_solo'] == 'argiloso': risco_base += 5.5
-        if chuva_acumulada > 400: risco_base += 4.0
-        if forn['rating_confiabilidade'] < 2.5: risco_base += 6.0
-        
-        # Variável Alvo: dias_atraso
-        dias_atraso = round(max(0, risco_base + random.normalvariate(2, 2.5)), 1)
-        
-        atividades.append({
-            'id_atividade': id_atv,
-            'id_obra': obra['id_obra'],
-            'id_fornecedor': forn['id_fornecedor'],
-            'etapa': etapa,
-            'dias_atraso': dias_atraso,
-            'status': 'atrasado' if dias_atraso > 5 else 'no prazo'
-        })
-        
-        # Base Consolidada (O que o App e o Bot lerão)
-        base_consulta.append({
-            'id_obra': obra['id_obra'],
-            'orcamento_estimado': obra['orcamento_estimado'],
-            'rating_confiabilidade': forn['rating_confiabilidade'],
-            'taxa_insucesso_fornecedor': taxa_insucesso_base,
-            'complexidade_obra': obra['complexidade_obra'],
-            'risco_etapa': dias_atraso, # Target real
-            'nivel_chuva': chuva_acumulada,
-            'tipo_solo': obra['tipo_solo'],
-            'material': random.choice(materiais),
-            'cidade': obra['cidade'],
-            'etapa': etapa
-        })
-
-# 5. Salvamento Padronizado
-pd.DataFrame(clima).to_csv('data/raw/climaccbjj.csv', index=False)
-pd.DataFrame(atividades).to_csv('data/raw/atividadesccbjj.csv', index=False)
-pd.DataFrame(base_consulta).to_csv('data/raw/base_consulta_botccbjj.csv', index=False)
-df_fornecedores.to_csv('data/raw/fornecedoresccbjj.csv', index=False)
-df_obras.to_csv('data/raw/obrasccbjj.csv', index=False)
-
-print(f"✅ Sucesso! Geradas {NUM_OBRAS} obras com integridade referencial.")
-print(f"📂 Arquivos salvos em 'data/raw/' prontos para o Pipeline de IA.")
+    chuva = rng.integers(30, 751, n)
+    clima = pd.DataFrame({'id_obra': df_obras['id_obra'].to_numpy(), 'chuva_mm': chuva})
+
+    # Expansão obra -> (obra, etapa) na mesma ordem do gerador original
+    idx_obra = np.repeat(np.arange(n), n_etapas)
+    etapa = np.tile(np.array(ETAPAS), n)
+    id_obra = df_obras['id_obra'].to_numpy()[idx_obra]
+    solo = df_obras['tipo_solo'].to_numpy()[idx_obra]
+    chuva_linha = chuva[idx_obra]
+
+    # Seleção de Fornecedor
+    idx_forn = rng.integers(0, len(df_fornecedores), n * n_etapas)
+    rating = df_fornecedores['rating_confiabilidade'].to_numpy()[idx_forn]
+    taxa_insucesso_base = np.round(rng.uniform(0.05, 0.45, n * n_etapas), 2)
+
+    # Material sorteado dentro da lista da própria etapa
+    material = np.empty(n * n_etapas, dtype=object)
+    for nome_etapa, materiais in etapas_materiais.items():
+        mask = etapa == nome_etapa
+        material[mask] = np.array(materiais, dtype=object)[rng.integers(0, len(materiais), mask.sum())]
+
+    # Lógica de Atraso Correlacionada (Regras de Engenharia)
+    risco_base = (
+        3.0
+        + 5.5 * ((etapa == 'fundação') & (solo == 'argiloso'))
+        + 4.0 * (chuva_linha > 400)
+        + 6.0 * (rating < 2.5)
+    )
+
+    # Variável Alvo: dias_atraso
+    dias_atraso = np.round(np.maximum(0, risco_base + rng.normal(2, 2.5, n * n_etapas)), 1)
+
+    atividades = pd.DataFrame({
+        'id_atividade': np.char.add(np.char.add(id_obra.astype(str), '_'), etapa),
+        'id_obra': id_obra,
+        'id_fornecedor': df_fornecedores['id_fornecedor'].to_numpy()[idx_forn],
+        'etapa': etapa,
+        'dias_atraso': dias_atraso,
+        'status': np.where(dias_atraso > 5, 'atrasado', 'no prazo'),
+    })
+
+    # Base Consolidada (O que o App e o Bot lerão)
+    base_consulta = pd.DataFrame({
+        'id_obra': id_obra,
+        'orcamento_estimado': df_obras['orcamento_estimado'].to_numpy()[idx_obra],
+        'rating_confiabilidade': rating,
+        'taxa_insucesso_fornecedor': taxa_insucesso_base,
+        'complexidade_obra': df_obras['complexidade_obra'].to_numpy()[idx_obra],
+        'risco_etapa': dias_atraso,  # Target real
+        'nivel_chuva': chuva_linha,
+        'tipo_solo': solo,
+        'material': material,
+        'cidade': df_obras['cidade'].to_numpy()[idx_obra],
+        'etapa': etapa,
+    })
+    return clima, atividades, base_consulta
+
+
+def gerar(num_obras: int = NUM_OBRAS, num_fornecedores: int = NUM_FORNECEDORES,
+          chunk_obras: int = CHUNK_OBRAS, seed: int = SEED, raw_dir: str = RAW_DIR):
+    """Gera o ecossistema sintético em lotes, anexando a cada CSV de saída."""
+    inicio_t = time.perf_counter()
+    os.makedirs(raw_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    fake = Faker('pt_BR')
+    Faker.seed(seed)
+
+    df_fornecedores = gerar_fornecedores(rng, fake, num_fornecedores)
+    ruas = np.array([fake.street_name().title() for _ in range(NOMES_FAKER)])
+
+    saidas = {
+        'clima': os.path.join(raw_dir, 'climaccbjj.csv'),
+        'atividades': os.path.join(raw_dir, 'atividadesccbjj.csv'),
+        'base_consulta': os.path.join(raw_dir, 'base_consulta_botccbjj.csv'),
+        'obras': os.path.join(raw_dir, 'obrasccbjj.csv'),
+    }
+    total_linhas = 0
+    for lote, inicio in enumerate(range(0, num_obras, chunk_obras)):
+        n = min(chunk_obras, num_obras - inicio)
+        df_obras = gerar_obras(rng, ruas, inicio, n)
+        clima, atividades, base_consulta = gerar_atividades(rng, df_obras, df_fornecedores)
+
+        # 5. Salvamento Padronizado (cabeçalho só no primeiro lote)
+        modo, cabecalho = ('w', True) if lote == 0 else ('a', False)
+        for nome, df in (('clima', clima), ('atividades', atividades),
+                         ('base_consulta', base_consulta), ('obras', df_obras)):
+            df.to_csv(saidas[nome], index=False, mode=modo, header=cabecalho)
+        total_linhas += len(base_consulta)
+
+    df_fornecedores.to_csv(os.path.join(raw_dir, 'fornecedoresccbjj.csv'), index=False)
+
+    duracao = time.perf_counter() - inicio_t
+    print(f"✅ Sucesso! Geradas {num_obras} obras ({total_linhas} atividades) com integridade referencial "
+          f"em {duracao:.2f}s ({total_linhas / max(duracao, 1e-9):,.0f} linhas/s).")
+    print(f"📂 Arquivos salvos em '{raw_dir}/' prontos para o Pipeline de IA.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gerador sintético vetorizado CCBJJ.")
+    parser.add_argument("--obras", type=int, default=NUM_OBRAS)
+    parser.add_argument("--fornecedores", type=int, default=NUM_FORNECEDORES)
+    parser.add_argument("--chunk-obras", type=int, default=CHUNK_OBRAS)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--saida", default=RAW_DIR)
+    args = parser.parse_args()
+    gerar(args.obras, args.fornecedores, args.chunk_obras, args.seed, args.saida)
@@ -0,0 +1,125 @@
+"""
+Gráfico de Risco - CCBJJ Engenharia
+Renderizador do gráfico de impacto do bot com a API orientada a objetos do matplotlib
+(Figure + FigureCanvasAgg, sem estado global do pyplot): a figura base é montada uma vez
+por idioma e cada requisição só atualiza barra e título. PNGs prontos ficam em cache LRU
+por (faixa de risco, cor, obra, idioma).
+"""
+
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from i18n import get_text
+
+# Limites configuráveis via ambiente
+GRAFICO_CACHE_MAX = int(os.getenv("CHART_CACHE_MAX", "512"))
+RESOLUCAO_FAIXA = 0.1  # dias: a barra é desenhada com esta resolução (chave do cache)
+X_MAX = 15
+DPI = 100
+
+
+def cor_risco(risco_valor: float) -> str:
+    """Cor pelo risco NÃO arredondado: mesmos limiares (7/10) do status do texto do bot."""
+    return 'green' if risco_valor <= 7 else 'orange' if risco_valor <= 10 else 'red'
+
+
+def faixa_risco(risco_valor: float) -> float:
+    """Quantiza o risco na resolução da barra (valores na mesma faixa geram o mesmo PNG)."""
+    return round(round(risco_valor / RESOLUCAO_FAIXA) * RESOLUCAO_FAIXA, 4)
+
+
+class _TemplateGrafico:
+    """Figura base de um idioma; o lock serializa as renderizações nesta figura."""
+
+    def __init__(self, lang: str):
+        import matplotlib.style
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        # O estilo só é aplicado na construção (rc_context), nunca em cada requisição
+        with matplotlib.style.context('ggplot'):
+            self.fig = Figure(figsize=(10, 5), dpi=DPI)
+            self.canvas = FigureCanvasAgg(self.fig)
+            self.ax = self.fig.add_subplot()
+            self.barra = self.ax.barh(['Impacto'], [0.0], height=0.5)[0]
+            self.ax.set_xlim(0, X_MAX)
+            self.titulo = self.ax.set_title("", fontsize=12, fontweight='bold')
+            self.fig.text(0.15, 0.02, get_text(lang, "chart_legend"),
+                          fontsize=9, bbox=dict(facecolor='white', alpha=0.5))
+            # Margens fixas no lugar de bbox_inches='tight' (que redesenha a figura toda vez)
+            self.fig.subplots_adjust(left=0.1, right=0.97, top=0.9, bottom=0.16)
+
+        # Camada estática (eixos, grade, legenda) rasterizada uma vez; barra e título são
+        # redesenhados por cima a cada requisição (blitting)
+        self.barra.set_animated(True)
+        self.titulo.set_animated(True)
+        self.canvas.draw()
+        self.fundo = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.lang = lang
+        self.lock = threading.Lock()
+
+    def render(self, largura: float, cor: str, id_obra: str) -> bytes:
+        from PIL import Image  # dependência do próprio matplotlib
+
+        with self.lock:
+            self.canvas.restore_region(self.fundo)
+            self.barra.set_width(largura)
+            self.barra.set_color(cor)
+            self.titulo.set_text(f"{get_text(self.lang, 'chart_title')}: {id_obra}")
+            self.ax.draw_artist(self.barra)
+            self.ax.draw_artist(self.titulo)
+            imagem = Image.frombuffer("RGBA", self.canvas.get_width_height(),
+                                      self.canvas.buffer_rgba(), "raw", "RGBA", 0, 1).copy()
+        buf = io.BytesIO()
+        # compress_level=1: PNG ~2x maior que o default, codificação bem mais rápida
+        imagem.save(buf, format="png", compress_level=1)
+        return buf.getvalue()
+
+
+class RenderizadorGrafico:
+    """Templates por idioma (criados sob demanda) + cache LRU de PNGs renderizados."""
+
+    def __init__(self, max_itens: int = GRAFICO_CACHE_MAX):
+        self.max_itens = max_itens
+        self._templates = {}
+        self._pngs = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _template(self, lang: str) -> _TemplateGrafico:
+        with self._lock:
+            template = self._templates.get(lang)
+            if template is None:
+                template = self._templates[lang] = _TemplateGrafico(lang)
+            return template
+
+    def render(self, risco_valor: float, id_obra: str, lang: str) -> io.BytesIO:
+        """PNG em um BytesIO novo (cada chamador pode consumir/seek à vontade)."""
+        # Largura quantizada, cor do valor exato: perto de 7/10 a faixa arredondada cruzaria o
+        # limiar e o gráfico discordaria do status (ex.: 7.04 -> faixa 7.0 verde, status ALERTA)
+        faixa = faixa_risco(risco_valor)
+        cor = cor_risco(risco_valor)
+        chave = (faixa, cor, id_obra, lang)
+        with self._lock:
+            png = self._pngs.get(chave)
+            if png is not None:
+                self._pngs.move_to_end(chave)
+                self.hits += 1
+                return io.BytesIO(png)
+            self.misses += 1
+
+        png = self._template(lang).render(faixa, cor, id_obra)
+        with self._lock:
+            self._pngs[chave] = png
+            self._pngs.move_to_end(chave)
+            while len(self._pngs) > self.max_itens:
+                self._pngs.popitem(last=False)
+        return io.BytesIO(png)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"itens": len(self._pngs), "idiomas": list(self._templates),
+                    "hits": self.hits, "misses": self.misses}
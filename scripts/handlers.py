@@ -3,7 +3,7 @@ from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 
-import database
+import async_database
 from i18n import TEXTS
 
 logger = logging.getLogger(__name__)
@@ -69,7 +69,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     logger.info(f"/help acionado por {user_id}")
     msg = update.effective_message
 
-    lang = database.get_language(user_id)
+    lang = await async_database.get_language(user_id)
     help_content = TEXTS.get(lang, {}).get("help") or TEXTS.get("pt", {}).get("help", "⚠️ Help not available. / Ajuda não disponível.")
     await msg.reply_text(help_content, parse_mode=ParseMode.MARKDOWN)
 
@@ -78,7 +78,7 @@ async def settings_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     Reconfigura a infraestrutura (CSV/Supabase) sem importação circular.
     """
     user_id = update.effective_user.id
-    lang = database.get_language(user_id)
+    lang = await async_database.get_language(user_id)
     logger.info(f"/settings acionado por {user_id}")
     msg = update.effective_message
 
@@ -26,12 +26,17 @@ TEXTS = {
             "❓ **Central de Ajuda CCBJJ**\n\n"
             "1. Envie o **ID da Obra** para gerar relatórios preditivos.\n"
             "2. Use /settings para trocar entre CSV e Supabase.\n"
-            "3. Use /language para alterar o idioma.\n\n"
+            "3. Use /language para alterar o idioma.\n"
+            "4. Use /portfolio [N] [cidade|etapa] para o ranking das obras mais arriscadas.\n\n"
             "O sistema utiliza IA para prever atrasos com base no histórico logístico."
         ),
 
         "processing": "🔍 **Processando Inteligência de Dados...**",
         "not_found": "❌ Obra `{id_obra}` não localizada na base `{modo}`.",
+        "rate_limited": "⏳ Muitas solicitações em sequência. Tente novamente em {segundos}s.",
+        "portfolio_header": "🏆 **Top {n} obras por risco** ({filtro}):",
+        "portfolio_empty": "❌ Nenhuma obra no ranking para `{filtro}`.",
+        "portfolio_all": "portfólio completo",
 
         "report_header": "🏗️ **ANÁLISE PREDITIVA CCBJJ**",
         "report_impact": "⏳ **Impacto Projetado:** `{risco:.2f} dias`",
@@ -40,11 +45,14 @@ TEXTS = {
             "📝 **Parecer Técnico:**\nO modelo detectou variações baseadas em tendências históricas. "
             "A classificação {status} sugere revisão imediata dos marcos críticos."
         ),
+        "report_drivers": "🔎 **Principais fatores (dias):**",
+        "driver_line": "• `{fator}`: {dias:+.2f}",
         "sending_files": "_Gerando gráficos e PDF oficial..._",
 
         "pdf_title": "RELATÓRIO TÉCNICO DE INTELIGÊNCIA PREDITIVA",
         "pdf_section_1": "1. DIAGNÓSTICO DA UNIDADE",
         "pdf_section_2": "2. ANÁLISE DO MODELO PREDITIVO (ML)",
+        "pdf_drivers": "Principais fatores (contribuição em dias sobre a média da base):",
         "pdf_footer": "Confidencial - CCBJJ Engenharia & Inteligência",
 
         "chart_title": "Impacto Previsto no Cronograma",
@@ -69,12 +77,17 @@ TEXTS = {
             "❓ **CCBJJ Help Center**\n\n"
             "1. Send the **Project ID** to generate predictive reports.\n"
             "2. Use /settings to toggle between CSV and Supabase.\n"
-            "3. Use /language to change language.\n\n"
+            "3. Use /language to change language.\n"
+            "4. Use /portfolio [N] [city|stage] for the riskiest projects ranking.\n\n"
             "The system uses AI to predict delays based on logistics history."
         ),
 
         "processing": "🔍 **Processing Data Intelligence...**",
         "not_found": "❌ Project `{id_obra}` not found in `{modo}` source.",
+        "rate_limited": "⏳ Too many requests in a row. Please try again in {segundos}s.",
+        "portfolio_header": "🏆 **Top {n} projects by risk** ({filtro}):",
+        "portfolio_empty": "❌ No projects in the ranking for `{filtro}`.",
+        "portfolio_all": "whole portfolio",
 
         "report_header": "🏗️ **CCBJJ PREDICTIVE ANALYSIS**",
         "report_impact": "⏳ **Projected Impact:** `{risco:.2f} days`",
@@ -83,11 +96,14 @@ TEXTS = {
             "📝 **Technical Note:**\nThe model identified variations based on historical trends. "
             "The {status} status suggests an immediate review of critical milestones."
         ),
+        "report_drivers": "🔎 **Main drivers (days):**",
+        "driver_line": "• `{fator}`: {dias:+.2f}",
         "sending_files": "_Generating official charts and PDF..._",
 
         "pdf_title": "PREDICTIVE INTELLIGENCE TECHNICAL REPORT",
         "pdf_section_1": "1. UNIT DIAGNOSTICS",
         "pdf_section_2": "2. PREDICTIVE MODEL ANALYSIS (ML)",
+        "pdf_drivers": "Main drivers (contribution in days over the baseline average):",
         "pdf_footer": "Confidential - CCBJJ Engineering & Data Intelligence",
 
         "chart_title": "Predicted Schedule Impact",
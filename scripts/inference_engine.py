@@ -0,0 +1,377 @@
+"""
+Motor de Inferência Rápida - CCBJJ Engenharia
+Compila o pipeline treinado (ColumnTransformer + RandomForest) em tabelas NumPy:
+- codificação: categorias do OneHotEncoder, medianas do imputer e média/escala do scaler;
+- floresta: todas as árvores achatadas em arrays únicos (filhos, feature, limiar, valor).
+A predição percorre todas as árvores de uma vez, sem validação do pandas/sklearn nem
+threads do joblib, com resultado numericamente idêntico ao pipeline.predict.
+
+O motor também é exportado como artefato plano (models/motor_inferencia.joblib, sem
+compressão) carregável com mmap_mode='r': vários workers compartilham uma única cópia
+física dos arrays via page cache e o startup não precisa do scikit-learn.
+
+Uso:
+    python scripts/inference_engine.py              # equivalência + latência
+    python scripts/inference_engine.py --exportar   # gera o artefato a partir do .pkl
+    python scripts/inference_engine.py --carga      # startup/RSS: pickle vs. mmap
+"""
+
+import sys
+import time
+import logging
+import argparse
+import subprocess
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+PIPELINE_PATH = BASE_DIR / "models" / "pipeline_random_forest.pkl"
+FEATURES_PATH = BASE_DIR / "models" / "features_metadata.joblib"
+MOTOR_PATH = BASE_DIR / "models" / "motor_inferencia.joblib"
+CSV_PATH = BASE_DIR / "data" / "processed" / "base_consulta_botccbjj.csv"
+LIMITE_LOOP = 64  # até este nº de linhas a codificação usa dicts em vez de pd.Categorical
+
+
+def _passos(transformador):
+    from sklearn.pipeline import Pipeline
+    if isinstance(transformador, Pipeline):
+        return [est for _, est in transformador.steps]
+    return [transformador]
+
+
+class MotorInferencia:
+    """Pipeline compilado; use compilar() para construir a partir do .pkl carregado."""
+
+    def __init__(self, categoricas, numericas, n_saida, arvores, n_estimators):
+        # categoricas: [(coluna, categorias, offset, fill_value)]
+        # numericas: [(coluna, offset, mediana, media, escala)]
+        self.categoricas = categoricas
+        self.numericas = numericas
+        self.n_saida = n_saida
+        (left, right, self.feature, self.threshold, self.value,
+         self.missing_esquerda, self.raizes, self.profundidade) = arvores
+        # Nós endereçados por índice dobrado (2 * no): filhos2[2 * no + lado] = 2 * filho,
+        # e os atributos do nó repetidos nas duas posições -> um gather por atributo por nível
+        self.filhos2 = np.empty(2 * len(left), dtype=np.intp)
+        self.filhos2[0::2], self.filhos2[1::2] = 2 * left, 2 * right
+        self.feature2 = np.repeat(self.feature, 2)
+        self.threshold2 = np.repeat(self.threshold, 2)
+        self.missing_esquerda2 = np.repeat(self.missing_esquerda, 2)
+        self.folha2 = np.repeat(left == np.arange(len(left)), 2)
+        self.value2 = np.repeat(self.value, 2)
+        self.n_estimators = n_estimators
+        self.versao_modelo = None  # fingerprint do .pkl de origem (preenchido em exportar)
+        self.colunas_cat = [c for c, *_ in categoricas]
+        self.colunas_num = [c for c, *_ in numericas]
+        self.colunas = self.colunas_cat + self.colunas_num
+        # Tabelas de codificação: valor -> coluna de saída do one-hot
+        self.mapas = [
+            {cat: offset + i for i, cat in enumerate(cats)} for _, cats, offset, _ in categoricas
+        ]
+        # Parâmetros numéricos vetorizados (média 0 / escala 1 preservam o valor bit a bit)
+        self.num_offsets = np.array([o for _, o, *_ in numericas], dtype=np.intp)
+        self.num_mediana = np.array([np.nan if m is None else m for _, _, m, _, _ in numericas])
+        self.num_media = np.array([0.0 if m is None else m for _, _, _, m, _ in numericas])
+        self.num_escala = np.array([1.0 if e is None else e for *_, e in numericas])
+
+    # --- Codificação ---------------------------------------------------------
+    def transformar(self, X: pd.DataFrame) -> np.ndarray:
+        """Equivalente ao preprocessor.transform, já em float32 (dtype usado pelas árvores)."""
+        n = len(X)
+        saida = np.zeros((n, self.n_saida), dtype=np.float64)
+        # Acesso coluna a coluna: X[lista].to_numpy() custa ~10x mais em frames pequenos
+        for (col, categorias, offset, fill_value), mapa in zip(self.categoricas, self.mapas):
+            valores = X[col].to_numpy()
+            if n <= LIMITE_LOOP:
+                # Poucas linhas (caso do bot): lookup em dict é mais barato que pd.Categorical
+                for i, v in enumerate(valores):
+                    if v is None or v != v:
+                        v = fill_value
+                    j = mapa.get(v)
+                    if j is not None:
+                        saida[i, j] = 1.0
+                continue
+            codes = pd.Categorical(valores, categories=categorias).codes.astype(np.int64)
+            if fill_value is not None and fill_value in mapa:
+                codes[pd.isna(valores) & (codes < 0)] = mapa[fill_value] - offset
+            # handle_unknown='ignore': categoria desconhecida -> linha toda zero
+            ok = codes >= 0
+            saida[np.flatnonzero(ok), offset + codes[ok]] = 1.0
+        if self.colunas_num:
+            v = np.column_stack([X[c].to_numpy(dtype=np.float64) for c in self.colunas_num])
+            v = np.where(np.isnan(v), self.num_mediana, v)
+            saida[:, self.num_offsets] = (v - self.num_media) / self.num_escala
+        return saida.astype(np.float32)
+
+    # --- Floresta --------------------------------------------------------------
+    def predict(self, X) -> np.ndarray:
+        """Mesma interface de pipeline.predict (DataFrame com as colunas do contrato ou dict)."""
+        if isinstance(X, dict):
+            X = pd.DataFrame([X])
+        Xt = self.transformar(X)
+        n, n_cols = Xt.shape
+        plano = Xt.ravel()
+        base_linha = (np.arange(n, dtype=np.intp) * n_cols)[:, None]
+        no2 = np.broadcast_to(2 * self.raizes, (n, len(self.raizes))).copy()
+        tem_nan = np.isnan(plano).any()
+        # Folhas apontam para si mesmas; paramos quando todos os caminhos chegaram a folhas
+        for nivel in range(1, self.profundidade + 1):
+            x = plano[base_linha + self.feature2[no2]]
+            if tem_nan:
+                # NaN segue a regra de missing do sklearn (missing_go_to_left por nó)
+                direita = np.where(np.isnan(x), ~self.missing_esquerda2[no2], ~(x <= self.threshold2[no2]))
+            else:
+                direita = x > self.threshold2[no2]
+            no2 = self.filhos2[no2 + direita]
+            if nivel % 4 == 0 and self.folha2[no2].all():
+                break
+        # Soma sequencial na ordem das árvores (mesma ordem de acumulação do sklearn)
+        return np.cumsum(self.value2[no2], axis=1)[:, -1] / self.n_estimators
+
+    # --- Explicação --------------------------------------------------------------
+    def _origem_colunas(self) -> np.ndarray:
+        """Coluna codificada -> índice da feature original em self.colunas (one-hot agrupado)."""
+        origem = np.empty(self.n_saida, dtype=np.intp)
+        for i, (_, categorias, offset, _) in enumerate(self.categoricas):
+            origem[offset:offset + len(categorias)] = i
+        for j, (_, offset, *_) in enumerate(self.numericas):
+            origem[offset] = len(self.categoricas) + j
+        return origem
+
+    def contribuicoes(self, X):
+        """
+        Decomposição por caminho nas árvores (Saabas): predição = viés + soma das
+        contribuições. Cada divisão atribui à sua feature a variação do valor do nó pai
+        para o filho; média na floresta. Retorna (viés por linha, DataFrame linhas x features).
+        """
+        if isinstance(X, dict):
+            X = pd.DataFrame([X])
+        Xt = self.transformar(X)
+        n, n_cols = Xt.shape
+        plano = Xt.ravel()
+        base_linha = (np.arange(n, dtype=np.intp) * n_cols)[:, None]
+        no2 = np.broadcast_to(2 * self.raizes, (n, len(self.raizes))).copy()
+        tem_nan = np.isnan(plano).any()
+        acumulado = np.zeros(n * self.n_saida, dtype=np.float64)
+        linha_base = (np.arange(n, dtype=np.intp) * self.n_saida)[:, None]
+        for nivel in range(1, self.profundidade + 1):
+            feature = self.feature2[no2]
+            x = plano[base_linha + feature]
+            if tem_nan:
+                direita = np.where(np.isnan(x), ~self.missing_esquerda2[no2], ~(x <= self.threshold2[no2]))
+            else:
+                direita = x > self.threshold2[no2]
+            filho2 = self.filhos2[no2 + direita]
+            # Folhas são auto-laços: delta zero, não alteram o acumulado
+            delta = self.value2[filho2] - self.value2[no2]
+            acumulado += np.bincount((linha_base + feature).ravel(), weights=delta.ravel(),
+                                     minlength=n * self.n_saida)
+            no2 = filho2
+            if nivel % 4 == 0 and self.folha2[no2].all():
+                break
+        por_coluna = acumulado.reshape(n, self.n_saida) / self.n_estimators
+        por_feature = np.zeros((n, len(self.colunas)))
+        np.add.at(por_feature.T, self._origem_colunas(), por_coluna.T)
+        vies = np.full(n, self.value2[2 * self.raizes].sum() / self.n_estimators)
+        return vies, pd.DataFrame(por_feature, columns=self.colunas, index=X.index)
+
+
+def _compilar_preprocessor(preprocessor, features):
+    # sklearn só é necessário para compilar; carregar o artefato exportado dispensa o import
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler, FunctionTransformer
+
+    categoricas, numericas, offset = [], [], 0
+    for nome, transformador, colunas in preprocessor.transformers_:
+        if transformador == "drop" or len(colunas) == 0:
+            continue
+        colunas = [features[c] if isinstance(c, (int, np.integer)) else c for c in colunas]
+        passos = [p for p in _passos(transformador) if p != "passthrough"]
+        encoder = next((p for p in passos if isinstance(p, OneHotEncoder)), None)
+        imputer = next((p for p in passos if isinstance(p, SimpleImputer)), None)
+        for p in passos:
+            if isinstance(p, FunctionTransformer) and p.func is not None:
+                raise ValueError(f"FunctionTransformer customizado em '{nome}' não suportado")
+            if not isinstance(p, (OneHotEncoder, SimpleImputer, StandardScaler, FunctionTransformer)):
+                raise ValueError(f"Transformador {type(p).__name__} em '{nome}' não suportado")
+
+        if encoder is not None:
+            if encoder.drop is not None or getattr(encoder, "_infrequent_enabled", False):
+                raise ValueError("OneHotEncoder com drop/infrequent não suportado")
+            fill = imputer.fill_value if imputer is not None and imputer.strategy == "constant" else None
+            for col, cats in zip(colunas, encoder.categories_):
+                categoricas.append((col, list(cats), offset, fill))
+                offset += len(cats)
+        else:
+            scaler = next((p for p in passos if isinstance(p, StandardScaler)), None)
+            for i, col in enumerate(colunas):
+                mediana = float(imputer.statistics_[i]) if imputer is not None else None
+                media = float(scaler.mean_[i]) if scaler is not None and scaler.mean_ is not None and scaler.with_mean else None
+                escala = float(scaler.scale_[i]) if scaler is not None and scaler.scale_ is not None else None
+                numericas.append((col, offset, mediana, media, escala))
+                offset += 1
+    return categoricas, numericas, offset
+
+
+def _achatar_floresta(arvores):
+    """Concatena as árvores; folhas viram auto-laços (feature 0, limiar +inf)."""
+    left, right, feature, threshold, value, missing, raizes = [], [], [], [], [], [], []
+    base, profundidade = 0, 0
+    for arvore in arvores:
+        t = arvore.tree_
+        if t.n_outputs != 1:
+            raise ValueError("Apenas regressão com uma saída é suportada")
+        folha = t.children_left == -1
+        ids = np.arange(t.node_count)
+        left.append(np.where(folha, ids, t.children_left) + base)
+        right.append(np.where(folha, ids, t.children_right) + base)
+        feature.append(np.where(folha, 0, t.feature))
+        threshold.append(np.where(folha, np.inf, t.threshold))
+        value.append(t.value[:, 0, 0])
+        # sklearn >= 1.3 roteia NaN por nó; versões antigas mandam NaN para a direita
+        missing.append(np.asarray(getattr(t, "missing_go_to_left", np.zeros(t.node_count)), dtype=bool))
+        raizes.append(base)
+        base += t.node_count
+        profundidade = max(profundidade, t.max_depth)
+    return (
+        np.concatenate(left).astype(np.intp), np.concatenate(right).astype(np.intp),
+        np.concatenate(feature).astype(np.intp), np.concatenate(threshold).astype(np.float64),
+        np.concatenate(value).astype(np.float64), np.concatenate(missing),
+        np.asarray(raizes, dtype=np.intp), profundidade,
+    )
+
+
+def compilar(pipeline, features) -> MotorInferencia:
+    """Compila o pipeline; levanta ValueError se algum passo não for suportado."""
+    preprocessor = pipeline.named_steps["preprocessor"]
+    regressor = pipeline.named_steps["regressor"]
+    if not hasattr(regressor, "estimators_") and not hasattr(regressor, "tree_"):
+        raise ValueError(f"regressor {type(regressor).__name__} não suportado (só árvores/florestas)")
+    categoricas, numericas, n_saida = _compilar_preprocessor(preprocessor, list(features))
+    arvores = getattr(regressor, "estimators_", None) or [regressor]
+    return MotorInferencia(categoricas, numericas, n_saida, _achatar_floresta(arvores), len(arvores))
+
+
+def compilar_ou_none(pipeline, features):
+    """Versão tolerante: retorna None (e o chamador usa pipeline.predict) se não suportado."""
+    try:
+        return compilar(pipeline, features)
+    except ValueError as e:
+        logger.info(f"Motor de inferência não compilado ({e}); usando pipeline.predict.")
+        return None
+    except Exception:
+        logger.exception("Falha ao compilar o motor de inferência; usando pipeline.predict.")
+        return None
+
+
+def exportar(motor: MotorInferencia, versao_modelo: str, path=MOTOR_PATH):
+    """Grava o estado do motor (dict de arrays, sem compressão: requisito do mmap)."""
+    import joblib
+    motor.versao_modelo = versao_modelo
+    # Dict puro em vez do objeto: o artefato não depende do caminho de import da classe
+    joblib.dump(dict(vars(motor)), path, compress=0)
+    logger.info(f"💾 Motor de inferência exportado em {path} (modelo {versao_modelo})")
+
+
+def carregar_motor(pipeline_path=PIPELINE_PATH, motor_path=MOTOR_PATH, mmap: bool = True):
+    """
+    Carrega o artefato com mmap_mode='r' se ele corresponder ao .pkl atual
+    (fingerprint); retorna None se ausente ou desatualizado.
+    """
+    import joblib
+    from prediction_cache import fingerprint_modelo
+    if not Path(motor_path).exists():
+        return None
+    try:
+        estado = joblib.load(motor_path, mmap_mode="r" if mmap else None)
+    except Exception:
+        logger.exception(f"Falha ao carregar {motor_path}")
+        return None
+    motor = MotorInferencia.__new__(MotorInferencia)
+    motor.__dict__.update(estado)
+    versao = fingerprint_modelo(pipeline_path) if Path(pipeline_path).exists() else None
+    if versao is not None and getattr(motor, "versao_modelo", None) != versao:
+        logger.warning(f"{motor_path} desatualizado em relação a {pipeline_path}; ignorando.")
+        return None
+    return motor
+
+
+def carregar_pipeline_worker(pipeline_path=PIPELINE_PATH):
+    """
+    Pipeline para processos de um pool: o paralelismo vem do pool, então o regressor
+    roda com n_jobs=1 (evita oversubscription das threads do RF; HistGradientBoosting
+    não tem n_jobs).
+    """
+    import joblib
+    pipeline = joblib.load(pipeline_path)
+    if "n_jobs" in pipeline.named_steps["regressor"].get_params():
+        pipeline.set_params(regressor__n_jobs=1)
+    return pipeline
+
+
+def _medir_carga(modo: str):
+    """Executado em subprocesso limpo: tempo de carga e RSS do processo."""
+    import resource
+    import joblib
+    inicio = time.perf_counter()
+    if modo == "pickle":
+        joblib.load(PIPELINE_PATH)
+    else:
+        carregar_motor()
+    duracao = time.perf_counter() - inicio
+    rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{modo}: {duracao * 1000:,.0f} ms | pico RSS {rss_mb:,.1f} MB")
+
+
+def relatorio_carga():
+    """Startup e RSS: joblib.load do pipeline completo vs. motor mmap (subprocessos isolados)."""
+    for modo in ("pickle", "mmap"):
+        subprocess.run([sys.executable, "-W", "ignore", __file__, "--_medir", modo], check=True)
+
+
+def benchmark(repeticoes: int = 200):
+    """Compara predições (diferença máxima) e latência de uma obra (3 etapas)."""
+    import joblib
+    pipeline = joblib.load(PIPELINE_PATH)
+    features = joblib.load(FEATURES_PATH)
+    df = pd.read_csv(CSV_PATH).reindex(columns=features, fill_value=0)
+    motor = compilar(pipeline, features)
+
+    esperado = pipeline.predict(df)
+    obtido = motor.predict(df)
+    print(f"📐 {len(df)} linhas | diferença máxima: {np.abs(esperado - obtido).max():.3e} "
+          f"| idênticas: {np.array_equal(esperado, obtido)}")
+
+    obra = df.iloc[:3]
+    for nome, fn in (("pipeline.predict", pipeline.predict), ("motor.predict", motor.predict)):
+        fn(obra)
+        tempos = []
+        for _ in range(repeticoes):
+            t0 = time.perf_counter()
+            fn(obra)
+            tempos.append(time.perf_counter() - t0)
+        print(f"⏱️ {nome:<18} mediana {np.median(tempos) * 1e6:,.0f} µs | p95 {np.percentile(tempos, 95) * 1e6:,.0f} µs")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Motor de inferência compilado CCBJJ.")
+    parser.add_argument("--exportar", action="store_true", help="Exporta o artefato mmap a partir do .pkl")
+    parser.add_argument("--carga", action="store_true", help="Relatório de startup/RSS antes e depois")
+    parser.add_argument("--_medir", choices=["pickle", "mmap"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args._medir:
+        _medir_carga(args._medir)
+    elif args.exportar:
+        import joblib
+        from prediction_cache import fingerprint_modelo
+        motor = compilar(joblib.load(PIPELINE_PATH), joblib.load(FEATURES_PATH))
+        exportar(motor, fingerprint_modelo(PIPELINE_PATH))
+    elif args.carga:
+        relatorio_carga()
+    else:
+        benchmark()
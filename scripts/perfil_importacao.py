@@ -0,0 +1,152 @@
+"""
+Perfil de Importação - CCBJJ Engenharia
+Mede o custo de import (cold start) com `python -X importtime` em subprocessos limpos,
+resume por pacote de topo e compara com o baseline versionado em reports/. O gate não usa
+ms absolutos (variam de máquina para máquina): usa a razão entre o import do bot e o de
+uma referência (as dependências inevitáveis do bot) medida na mesma execução, além de
+exigir que bibliotecas pesadas de relatório/ML não sejam importadas no cold start.
+
+Uso:
+    python scripts/perfil_importacao.py                 # relatório no terminal
+    python scripts/perfil_importacao.py --salvar        # atualiza o baseline versionado
+    python scripts/perfil_importacao.py --verificar     # exit 1 se houver regressão
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SCRIPTS_DIR = BASE_DIR / "scripts"
+BASELINE_PATH = BASE_DIR / "reports" / "importtime_telegram_bot.json"
+
+MODULO = "telegram_bot"
+REPETICOES = 5
+# Dependências que o bot sempre importa: a razão bot/referência isola o custo que o
+# código do bot controla (imports extras, trabalho em nível de módulo)
+REFERENCIA = ["pandas", "fastapi", "sqlalchemy", "telegram"]
+TOLERANCIA = 0.25  # regressão aceita sobre a razão do baseline (25%)
+TOP_N = 15
+
+# Bibliotecas que só podem ser importadas sob demanda (relatório, treino), nunca no cold start
+PROIBIDOS_NO_IMPORT = ["matplotlib", "reportlab", "sklearn", "scipy"]
+
+_LINHA = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def _rodar_importtime(modulo: str) -> str:
+    """Um import em processo novo; devolve o stderr com as linhas do -X importtime."""
+    env = dict(os.environ, PYTHONPATH=str(SCRIPTS_DIR), MPLCONFIGDIR="/tmp/matplotlib")
+    env.pop("DATABASE_URL", None)  # sem efeitos de rede no import
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-W", "ignore", "-c", f"import {modulo}"],
+        cwd=str(SCRIPTS_DIR), env=env, capture_output=True, text=True, check=True
+    )
+    return proc.stderr
+
+
+def parse_importtime(stderr: str) -> dict:
+    """Cumulativo (ms) por módulo e tempo próprio (self) somado por pacote de topo."""
+    por_modulo, por_pacote = {}, {}
+    for linha in stderr.splitlines():
+        m = _LINHA.match(linha)
+        if not m:
+            continue
+        nome = m.group(4)
+        por_modulo[nome] = int(m.group(2)) / 1000
+        # Soma de self: cada ms é atribuído a um único pacote (total = import completo)
+        raiz = nome.split(".")[0]
+        por_pacote[raiz] = por_pacote.get(raiz, 0.0) + int(m.group(1)) / 1000
+    return {"modulos": por_modulo, "pacotes": por_pacote}
+
+
+def medir(modulo: str = MODULO, repeticoes: int = REPETICOES) -> dict:
+    """
+    Mediana de N execuções (o primeiro processo aquece o cache de .pyc e não conta).
+    Bot e referência alternados, para que ambos sofram o mesmo ruído da máquina.
+    """
+    referencia = ", ".join(REFERENCIA)
+    _rodar_importtime(modulo)
+    _rodar_importtime(referencia)
+    amostras, totais_ref = [], []
+    for _ in range(repeticoes):
+        amostras.append(parse_importtime(_rodar_importtime(modulo)))
+        ref = parse_importtime(_rodar_importtime(referencia))
+        totais_ref.append(sum(ref["modulos"].get(m, 0.0) for m in REFERENCIA))
+    pacotes = {
+        p: statistics.median(a["pacotes"].get(p, 0.0) for a in amostras)
+        for p in amostras[0]["pacotes"]
+    }
+    total = statistics.median(a["modulos"].get(modulo, 0.0) for a in amostras)
+    total_ref = statistics.median(totais_ref)
+    return {
+        "modulo": modulo,
+        "python": sys.version.split()[0],
+        "repeticoes": repeticoes,
+        "total_ms": round(total, 1),
+        "referencia": REFERENCIA,
+        "referencia_ms": round(total_ref, 1),
+        "razao": round(total / max(total_ref, 1e-9), 3),
+        "top_pacotes_ms": {
+            p: round(ms, 1) for p, ms in sorted(pacotes.items(), key=lambda kv: -kv[1])[:TOP_N]
+        },
+        "proibidos_importados": [
+            p for p in PROIBIDOS_NO_IMPORT if any(m.split(".")[0] == p for m in amostras[0]["modulos"])
+        ],
+    }
+
+
+def imprimir(relatorio: dict):
+    print(f"\n⏱️  import {relatorio['modulo']}: {relatorio['total_ms']:.0f} ms "
+          f"(mediana de {relatorio['repeticoes']}, Python {relatorio['python']})")
+    print(f"   referência ({', '.join(relatorio['referencia'])}): {relatorio['referencia_ms']:.0f} ms "
+          f"-> razão {relatorio['razao']:.2f}")
+    for pacote, ms in relatorio["top_pacotes_ms"].items():
+        print(f"   {pacote:<28} {ms:>8.1f} ms")
+    if relatorio["proibidos_importados"]:
+        print(f"⚠️  Importados no cold start: {', '.join(relatorio['proibidos_importados'])}")
+
+
+def verificar(relatorio: dict, baseline_path=BASELINE_PATH, tolerancia: float = TOLERANCIA) -> bool:
+    """Bibliotecas proibidas no cold start e razão bot/referência contra o baseline versionado."""
+    if relatorio["proibidos_importados"]:
+        print(f"❌ Regressão: {', '.join(relatorio['proibidos_importados'])} importado(s) no cold start do bot.")
+        return False
+    if not Path(baseline_path).exists():
+        print(f"⚠️  Baseline não encontrado em {baseline_path}; rode com --salvar.")
+        return True
+    baseline = json.loads(Path(baseline_path).read_text())
+    if "razao" not in baseline:
+        print(f"⚠️  Baseline sem razão bot/referência (formato antigo); rode com --salvar.")
+        return True
+    limite = baseline["razao"] * (1 + tolerancia)
+    if relatorio["razao"] > limite:
+        print(f"❌ Regressão: razão {relatorio['razao']:.2f} > {limite:.2f} "
+              f"(baseline {baseline['razao']:.2f} + {tolerancia:.0%}).")
+        return False
+    print(f"✅ Dentro do baseline (razão {relatorio['razao']:.2f} <= {limite:.2f}).")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perfil de import (-X importtime) do bot CCBJJ.")
+    parser.add_argument("--modulo", default=MODULO)
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES)
+    parser.add_argument("--salvar", action="store_true", help="grava o relatório como baseline")
+    parser.add_argument("--verificar", action="store_true", help="falha se a razão regredir ou houver import proibido")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA)
+    args = parser.parse_args()
+
+    relatorio = medir(args.modulo, args.repeticoes)
+    imprimir(relatorio)
+    if args.salvar:
+        BASELINE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        BASELINE_PATH.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False) + "\n")
+        print(f"💾 Baseline salvo em {BASELINE_PATH}")
+    if args.verificar and not verificar(relatorio, tolerancia=args.tolerancia):
+        sys.exit(1)
@@ -0,0 +1,94 @@
+"""
+Pool de Renderização - CCBJJ Engenharia
+Executor dedicado e limitado para gráficos/PDFs do bot. Mantém a renderização fora do
+executor padrão do asyncio (usado pela predição e pelo banco) e aplica backpressure:
+no máximo `max_workers + max_fila` tarefas aceitas; as demais aguardam vaga sem
+bloquear o event loop. Métricas de fila expostas em `stats()`.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+RENDER_QUEUE_MAX = int(os.getenv("RENDER_QUEUE_MAX", "32"))
+
+
+class PoolRenderizacao:
+    def __init__(self, max_workers: int = RENDER_WORKERS, max_fila: int = RENDER_QUEUE_MAX):
+        self.max_workers = max_workers
+        self.max_fila = max_fila
+        self._executor = None
+        self._vagas = None
+        self._lock = threading.Lock()
+        self._metricas = {
+            "em_fila": 0, "em_execucao": 0, "aguardando_vaga": 0, "max_fila": 0,
+            "concluidas": 0, "falhas": 0, "espera_total_ms": 0.0, "execucao_total_ms": 0.0,
+        }
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="render")
+        return self._executor
+
+    def _incrementar(self, chave: str, valor=1):
+        with self._lock:
+            self._metricas[chave] += valor
+            if chave == "em_fila":
+                self._metricas["max_fila"] = max(self._metricas["max_fila"], self._metricas["em_fila"])
+
+    def _executar(self, enfileirado_em: float, fn, args):
+        inicio = time.perf_counter()
+        self._incrementar("em_fila", -1)
+        self._incrementar("em_execucao")
+        self._incrementar("espera_total_ms", (inicio - enfileirado_em) * 1000)
+        try:
+            return fn(*args)
+        finally:
+            self._incrementar("em_execucao", -1)
+            self._incrementar("execucao_total_ms", (time.perf_counter() - inicio) * 1000)
+
+    async def executar(self, fn, *args):
+        """Roda fn(*args) no pool dedicado, aguardando vaga se o limite estiver cheio."""
+        if self._vagas is None:
+            self._vagas = asyncio.Semaphore(self.max_workers + self.max_fila)
+        if self._vagas.locked():
+            self._incrementar("aguardando_vaga")
+            try:
+                await self._vagas.acquire()
+            finally:
+                self._incrementar("aguardando_vaga", -1)
+        else:
+            await self._vagas.acquire()
+        try:
+            self._incrementar("em_fila")
+            loop = asyncio.get_running_loop()
+            resultado = await loop.run_in_executor(
+                self._get_executor(), self._executar, time.perf_counter(), fn, args
+            )
+            self._incrementar("concluidas")
+            return resultado
+        except Exception:
+            self._incrementar("falhas")
+            raise
+        finally:
+            self._vagas.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            m = dict(self._metricas)
+        finalizadas = max(m["concluidas"] + m["falhas"], 1)
+        m["espera_media_ms"] = m.pop("espera_total_ms") / finalizadas
+        m["execucao_media_ms"] = m.pop("execucao_total_ms") / finalizadas
+        m.update(workers=self.max_workers, limite_fila=self.max_fila)
+        return m
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
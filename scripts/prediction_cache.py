@@ -0,0 +1,146 @@
+"""
+Cache de Predições - CCBJJ Engenharia
+Guarda risco/status por obra para evitar reexecutar o RandomForest a cada mensagem.
+Chave: (id_obra, fingerprint do modelo CARREGADO). Validade: hash das linhas + TTL + LRU.
+"""
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Limites configuráveis via ambiente
+CACHE_MAX_ITENS = int(os.getenv("PREDICTION_CACHE_MAX", "5000"))
+CACHE_TTL_SEGUNDOS = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+
+
+@dataclass(frozen=True)
+class PredicaoCache:
+    risco: float
+    status: str
+    row_hash: str
+    criado_em: float
+    fatores: tuple = None  # principais fatores ((rótulo, dias), ...); None = não calculados
+
+
+def fingerprint_modelo(path) -> str:
+    """SHA-256 (truncado) do arquivo do modelo: muda sempre que o .pkl é re-treinado."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()[:16]
+
+
+def hash_linhas(X: pd.DataFrame) -> str:
+    """Hash estável das linhas de entrada do modelo (detecta mudanças na base)."""
+    valores = pd.util.hash_pandas_object(X, index=False).to_numpy()
+    return hashlib.blake2b(valores.tobytes(), digest_size=16).hexdigest()
+
+
+class PredictionCache:
+    """
+    LRU com TTL por versão do modelo em memória. A chave usa o fingerprint do modelo que o
+    processo de fato carregou (não o .pkl em disco): após um re-treino, as predições do
+    modelo antigo nunca são gravadas sob a versão nova. Se o arquivo mudar, só avisa.
+    """
+
+    def __init__(self, model_path, model_version: str = None, max_itens: int = CACHE_MAX_ITENS,
+                 ttl: float = CACHE_TTL_SEGUNDOS):
+        self.model_path = Path(model_path)
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._dados = OrderedDict()
+        self._lock = threading.Lock()
+        self._stat_modelo = None
+        self.model_version = model_version or fingerprint_modelo(self.model_path)
+        self.versao_em_disco = self.model_version
+        self.hits = 0
+        self.misses = 0
+        self._verificar_modelo()
+
+    def _verificar_modelo(self):
+        """Compara mtime/tamanho do .pkl (barato); se o arquivo mudou, avisa que o processo está desatualizado."""
+        try:
+            st = self.model_path.stat()
+        except OSError:
+            return
+        assinatura = (st.st_mtime_ns, st.st_size)
+        if assinatura != self._stat_modelo:
+            self._stat_modelo = assinatura
+            versao = fingerprint_modelo(self.model_path)
+            if versao != self.versao_em_disco and versao != self.model_version:
+                logger.warning(
+                    f"Modelo em disco alterado ({self.model_version} -> {versao}); este processo "
+                    f"segue servindo {self.model_version} até ser reiniciado."
+                )
+            self.versao_em_disco = versao
+
+    @property
+    def desatualizado(self) -> bool:
+        """True se o .pkl em disco não é mais o modelo carregado (reinício pendente)."""
+        with self._lock:
+            self._verificar_modelo()
+            return self.versao_em_disco != self.model_version
+
+    def get(self, id_obra: str, row_hash: str):
+        """Retorna PredicaoCache válido ou None (miss, expirado ou base alterada)."""
+        with self._lock:
+            self._verificar_modelo()
+            chave = (id_obra, self.model_version)
+            item = self._dados.get(chave)
+            if item is None or item.row_hash != row_hash or time.monotonic() - item.criado_em > self.ttl:
+                if item is not None:
+                    del self._dados[chave]
+                self.misses += 1
+                return None
+            self._dados.move_to_end(chave)
+            self.hits += 1
+            return item
+
+    def put(self, id_obra: str, row_hash: str, risco: float, status: str, fatores: tuple = None):
+        with self._lock:
+            chave = (id_obra, self.model_version)
+            self._dados[chave] = PredicaoCache(
+                risco, status, row_hash, time.monotonic(), None if fatores is None else tuple(fatores)
+            )
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_itens:
+                self._dados.popitem(last=False)
+
+    def invalidate(self, id_obra: str = None):
+        """Remove uma obra (todas as versões de modelo) ou limpa tudo."""
+        with self._lock:
+            if id_obra is None:
+                self._dados.clear()
+                return
+            for chave in [k for k in self._dados if k[0] == id_obra]:
+                del self._dados[chave]
+
+    def warm(self, df_base: pd.DataFrame, features, pipeline, classificar, indice: dict):
+        """Aquecimento em lote: um único predict vetorizado sobre toda a base."""
+        if df_base.empty or not indice:
+            return 0
+        inicio = time.perf_counter()
+        X = df_base.reindex(columns=features, fill_value=0)
+        preds = pipeline.predict(X)
+        total = 0
+        for id_obra, posicoes in indice.items():
+            if self.max_itens and total >= self.max_itens:
+                break
+            risco = float(preds[posicoes].mean())
+            self.put(id_obra, hash_linhas(X.iloc[posicoes]), risco, classificar(risco))
+            total += 1
+        logger.info(f"Cache de predições aquecido: {total} obras em {time.perf_counter() - inicio:.2f}s")
+        return total
+
+    def __len__(self):
+        return len(self._dados)
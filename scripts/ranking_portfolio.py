@@ -0,0 +1,127 @@
+"""
+Ranking do Portfólio - CCBJJ Engenharia
+Índice ordenado de risco por obra, construído a partir de uma predição em lote sobre a
+base e mantido incrementalmente a cada nova predição do bot. Consultas top-N (geral, por
+cidade ou por etapa) leem só as N primeiras posições da lista ordenada do grupo: custo
+independente do tamanho do portfólio.
+"""
+
+import time
+import bisect
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CHUNK_PREDICAO = 200_000  # linhas por predict em lote (memória estável em bases grandes)
+
+
+class RankingRisco:
+    """
+    Listas ordenadas de (-risco, id_obra) por grupo: ("todas",), ("cidade", c) e ("etapa", e).
+    No grupo de etapa o risco é o da própria etapa; nos demais, a média das etapas da obra
+    (mesma regra da resposta do bot).
+    """
+
+    def __init__(self):
+        self._obras = {}    # id_obra -> {"cidade": str, "etapas": {etapa: risco}, "risco": float}
+        self._grupos = {}   # grupo -> lista ordenada de (-risco, id_obra)
+        self._lock = threading.Lock()
+
+    # --- construção em lote ---
+    def construir(self, df_base: pd.DataFrame, indice, features, modelo) -> int:
+        """Um predict vetorizado (em chunks) sobre toda a base e ordenação única por grupo."""
+        if df_base.empty or not len(indice):
+            return 0
+        inicio = time.perf_counter()
+        X = df_base.reindex(columns=features, fill_value=0)
+        preds = np.concatenate([
+            modelo.predict(X.iloc[i:i + CHUNK_PREDICAO]) for i in range(0, len(X), CHUNK_PREDICAO)
+        ])
+        # Listas Python (fatias de list são bem mais baratas que de ndarray pequenos)
+        riscos_l = preds.tolist()
+        etapas = df_base["etapa"].astype(str).tolist() if "etapa" in df_base.columns else None
+        cidades = df_base["cidade"].astype(str).tolist() if "cidade" in df_base.columns else None
+
+        obras, grupos = {}, {("todas",): []}
+        for id_obra, posicoes in indice.items():
+            riscos = riscos_l[posicoes]
+            if not riscos:
+                continue
+            risco = sum(riscos) / len(riscos)
+            cidade = cidades[posicoes.start] if cidades is not None else None
+            por_etapa = dict(zip(etapas[posicoes], riscos)) if etapas is not None else {}
+            obras[id_obra] = {"cidade": cidade, "etapas": por_etapa, "risco": risco}
+            chave = (-risco, id_obra)
+            grupos[("todas",)].append(chave)
+            if cidade is not None:
+                grupos.setdefault(("cidade", cidade), []).append(chave)
+            for etapa, risco_etapa in por_etapa.items():
+                grupos.setdefault(("etapa", etapa), []).append((-risco_etapa, id_obra))
+        for lista in grupos.values():
+            lista.sort()
+
+        with self._lock:
+            self._obras, self._grupos = obras, grupos
+        logger.info(f"🏆 Ranking do portfólio: {len(obras)} obras em {time.perf_counter() - inicio:.2f}s")
+        return len(obras)
+
+    @staticmethod
+    def _entradas(info: dict):
+        """(grupo, risco) de uma obra em cada lista ordenada."""
+        yield ("todas",), info["risco"]
+        if info["cidade"] is not None:
+            yield ("cidade", info["cidade"]), info["risco"]
+        for etapa, risco in info["etapas"].items():
+            yield ("etapa", etapa), risco
+
+    # --- manutenção incremental ---
+    def atualizar(self, id_obra: str, riscos_por_etapa: dict, cidade=None):
+        """Reposiciona a obra após uma nova predição (busca binária + inserção por grupo)."""
+        if not riscos_por_etapa:
+            return
+        novo = {
+            "cidade": cidade,
+            "etapas": {str(e): float(r) for e, r in riscos_por_etapa.items()},
+            "risco": float(np.mean(list(riscos_por_etapa.values()))),
+        }
+        with self._lock:
+            antigo = self._obras.get(id_obra)
+            if antigo is not None:
+                if novo["cidade"] is None:
+                    novo["cidade"] = antigo["cidade"]
+                for grupo, risco in self._entradas(antigo):
+                    lista = self._grupos.get(grupo, [])
+                    i = bisect.bisect_left(lista, (-risco, id_obra))
+                    if i < len(lista) and lista[i] == (-risco, id_obra):
+                        del lista[i]
+            self._obras[id_obra] = novo
+            for grupo, risco in self._entradas(novo):
+                bisect.insort(self._grupos.setdefault(grupo, []), (-risco, id_obra))
+
+    # --- consultas ---
+    def top(self, n: int = 10, cidade: str = None, etapa: str = None) -> list:
+        """Top-N mais arriscadas (filtro opcional por cidade OU etapa)."""
+        grupo = ("etapa", etapa) if etapa else ("cidade", cidade) if cidade else ("todas",)
+        with self._lock:
+            lista = self._grupos.get(grupo, [])[:max(n, 0)]
+            return [
+                {
+                    "id_obra": id_obra,
+                    "risco": -neg_risco,
+                    "cidade": self._obras[id_obra]["cidade"],
+                    "pior_etapa": max(self._obras[id_obra]["etapas"].items(), key=lambda kv: kv[1], default=(None,))[0],
+                }
+                for neg_risco, id_obra in lista
+            ]
+
+    def valores_grupo(self, tipo: str) -> list:
+        """Cidades ou etapas conhecidas (para interpretar os filtros do comando)."""
+        with self._lock:
+            return sorted(g[1] for g in self._grupos if g[0] == tipo)
+
+    def __len__(self):
+        return len(self._obras)
@@ -0,0 +1,129 @@
+"""
+Relatório PDF - CCBJJ Engenharia
+Template reutilizável do relatório corporativo do bot: o logo é decodificado e reduzido ao
+tamanho impresso UMA vez por processo e guardado como JPEG em memória; o drawImage embute
+JPEG sem recodificar (DCT direto), então por documento o logo é só cópia de bytes. Os textos
+fixos por idioma também ficam resolvidos no template; por relatório só entram dados e gráfico.
+"""
+
+import io
+import logging
+import threading
+from functools import lru_cache
+
+from i18n import get_text
+
+logger = logging.getLogger(__name__)
+
+LARGURA_LOGO_CM = 4
+DPI_LOGO = 300  # resolução de impressão do logo (o PNG original é bem maior que 4 cm)
+
+
+@lru_cache(maxsize=None)
+def textos_estaticos(lang: str) -> dict:
+    return {chave: get_text(lang, chave) for chave in ("pdf_title", "pdf_section_1", "pdf_section_2", "pdf_drivers", "pdf_footer")}
+
+
+class TemplatePDF:
+    """Camada estática do relatório (logo reduzido em JPEG + geometria da página A4)."""
+
+    def __init__(self, logo_path):
+        from reportlab.lib.pagesizes import A4
+        from reportlab.lib.units import cm
+
+        self.cm = cm
+        self.largura, self.altura = A4
+        self.logo = None
+        if logo_path.exists():
+            self._preparar_logo(logo_path)
+        else:
+            logger.warning(f"Logo não encontrado em {logo_path}")
+
+    def _preparar_logo(self, logo_path):
+        from PIL import Image
+
+        with Image.open(logo_path) as img:
+            img = img.convert("RGB")
+            largura_px = int(LARGURA_LOGO_CM / 2.54 * DPI_LOGO)
+            if img.width > largura_px:
+                img = img.resize((largura_px, round(img.height * largura_px / img.width)), Image.LANCZOS)
+            buf = io.BytesIO()
+            img.save(buf, "JPEG", quality=92)
+        self.logo = buf.getvalue()
+
+    def desenhar_estatico(self, c, lang: str):
+        """Logo, cabeçalho, divisória e rodapé (idênticos em todos os relatórios do idioma)."""
+        from reportlab.lib.utils import ImageReader
+
+        cm, largura, altura = self.cm, self.largura, self.altura
+        textos = textos_estaticos(lang)
+        if self.logo is not None:
+            # Leitor novo por documento (handle próprio: relatórios rodam em threads)
+            c.drawImage(ImageReader(io.BytesIO(self.logo)), largura/2 - 2*cm, altura - 4*cm,
+                        width=LARGURA_LOGO_CM*cm, preserveAspectRatio=True)
+
+        c.setFont("Helvetica-Bold", 20)
+        c.drawCentredString(largura/2, altura - 6*cm, "CCBJJ ENGENHARIA")
+        c.setFont("Helvetica", 14)
+        c.drawCentredString(largura/2, altura - 7*cm, textos["pdf_title"])
+        c.line(2*cm, altura - 8*cm, largura - 2*cm, altura - 8*cm)
+
+        c.setFont("Helvetica-Oblique", 8)
+        c.drawCentredString(largura/2, 2*cm, textos["pdf_footer"])
+
+    def render(self, id_obra, risco, status, modo, graf_buf, lang, data_hora: str, fatores=()) -> io.BytesIO:
+        from reportlab.lib.utils import ImageReader
+        from reportlab.pdfgen import canvas
+
+        cm, altura = self.cm, self.altura
+        textos = textos_estaticos(lang)
+        pdf_buf = io.BytesIO()
+        c = canvas.Canvas(pdf_buf, pagesize=(self.largura, altura))
+        self.desenhar_estatico(c, lang)
+
+        # Conteúdo Detalhado
+        text_obj = c.beginText(2*cm, altura - 9.5*cm)
+        text_obj.setFont("Helvetica-Bold", 12)
+        text_obj.textLine(textos["pdf_section_1"])
+        text_obj.setFont("Helvetica", 11)
+        text_obj.textLine(f"• ID: {id_obra}")
+        text_obj.textLine(f"• Status: {status}")
+        text_obj.textLine(f"• Impacto: {risco:.2f} dias")
+        text_obj.textLine(f"• Fonte: {modo} | Data: {data_hora}")
+
+        text_obj.moveCursor(0, 15)
+        text_obj.setFont("Helvetica-Bold", 12)
+        text_obj.textLine(textos["pdf_section_2"])
+        text_obj.setFont("Helvetica", 11)
+        text_obj.textLine("Análise preditiva baseada em algoritmos de Machine Learning (Random Forest).")
+        if fatores:
+            text_obj.textLine(textos["pdf_drivers"])
+            for rotulo, dias in fatores:
+                text_obj.textLine(f"   • {rotulo}: {dias:+.2f}")
+        c.drawText(text_obj)
+
+        # Imagem do Gráfico (opcional: se a renderização falhou, o relatório sai sem ele)
+        if graf_buf is not None:
+            graf_buf.seek(0)
+            # Ancorado abaixo do texto (com os fatores, a seção 2 desce até ~15 cm do topo)
+            c.drawImage(ImageReader(graf_buf), 2*cm, altura - 24.5*cm, width=17*cm, height=8.5*cm,
+                        preserveAspectRatio=True, anchor="sw")
+
+        c.showPage()
+        c.save()
+        pdf_buf.seek(0)
+        return pdf_buf
+
+
+_TEMPLATE = None
+_TEMPLATE_LOCK = threading.Lock()
+
+
+def get_template(logo_path) -> TemplatePDF:
+    """Template único do processo (criado no primeiro relatório)."""
+    global _TEMPLATE
+    if _TEMPLATE is None:
+        with _TEMPLATE_LOCK:
+            if _TEMPLATE is None:
+                _TEMPLATE = TemplatePDF(logo_path)
+    return _TEMPLATE
@@ -38,7 +38,9 @@ def main():
     etapas = [
         {"nome": "Geração de Dados Brutos", "script": "scripts/gerar_dados.py"},
         {"nome": "Consolidação e Limpeza (Célula 18)", "script": "scripts/consolidar_base.py"},
+        {"nome": "Exportação Colunar (Parquet)", "script": "scripts/base_colunar.py"},
         {"nome": "Treinamento da IA (Random Forest)", "script": "scripts/train_model.py"},
+        {"nome": "Explicabilidade (PD + Importâncias)", "script": "scripts/explicabilidade.py"},
         {"nome": "BI e Relatórios Executivos (Célula 19)", "script": "scripts/gerar_relatorios.py"}
     ]
 
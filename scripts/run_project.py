@@ -42,7 +42,9 @@ def main():
     pipeline = [
         ("Geração de Dados Sintéticos", "scripts/gerar_dados.py"),
         ("Consolidação de Database (Célula 18)", "scripts/consolidar_base.py"),
+        ("Exportação Colunar (Parquet)", "scripts/base_colunar.py"),
         ("Treinamento do Modelo de IA", "scripts/train_model.py"),
+        ("Explicabilidade do Modelo (PD + Importâncias)", "scripts/explicabilidade.py"),
         ("Geração de Relatórios e BI (Célula 19)", "scripts/gerar_relatorios.py")
     ]
 
@@ -0,0 +1,45 @@
+"""
+Motor de Sensibilidade - CCBJJ Engenharia
+Monta a grade de cenários (produto cartesiano dos eixos varridos) como UM DataFrame
+pré-alocado, a partir de arrays de índices, e avalia tudo num único predict em lote.
+O resultado volta no formato da grade (um eixo por dimensão), pronto para linhas,
+barras e heatmaps do dashboard.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Eixos padrão do dashboard
+FAIXA_CHUVA = np.linspace(0, 800, 41)
+RATINGS = np.array([1, 2, 3, 4, 5], dtype=float)
+TIPOS_SOLO = ['arenoso', 'argiloso', 'rochoso', 'siltoso']
+
+
+def montar_grade(base: dict, features, eixos: dict):
+    """
+    DataFrame com uma linha por combinação dos eixos (ordem C: o último eixo varia mais
+    rápido) e os demais campos de `base` repetidos; colunas na ordem de `features`.
+    """
+    valores = [np.asarray(v) for v in eixos.values()]
+    forma = tuple(len(v) for v in valores)
+    n = int(np.prod(forma))
+    indices = np.indices(forma).reshape(len(forma), n)
+
+    colunas = {nome: vals[idx] for nome, vals, idx in zip(eixos, valores, indices)}
+    for col in features:
+        if col not in colunas:
+            valor = base.get(col, 0)
+            colunas[col] = np.full(n, valor, dtype=object if isinstance(valor, str) else np.float64)
+    return pd.DataFrame(colunas, columns=list(features)), forma
+
+
+def varrer(modelo, base: dict, features, eixos: dict) -> np.ndarray:
+    """Predição da grade inteira numa chamada; devolve array com a forma dos eixos."""
+    grade, forma = montar_grade(base, features, eixos)
+    return np.asarray(modelo.predict(grade), dtype=np.float64).reshape(forma)
+
+
+def eixo_com_valor(faixa, valor) -> tuple:
+    """Insere o valor atual no eixo (ordenado, sem duplicar) e devolve (eixo, posição do valor)."""
+    eixo = np.union1d(np.asarray(faixa, dtype=np.float64), [float(valor)])
+    return eixo, int(np.searchsorted(eixo, float(valor)))
@@ -1,17 +1,330 @@
 import pandas as pd
 import os
+import io
+import csv
+import time
+import gzip
+import hashlib
 import logging
-from sqlalchemy import create_engine
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from sqlalchemy import create_engine, inspect, text
 from dotenv import load_dotenv
 
 # Configuração de logs
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
 
-def carregar_dados_supabase():
+TABELA = "dashboard_obras"
+TABELA_STAGING = f"{TABELA}_staging"
+PATH_ARQUIVO = "data/processed/df_mestre_consolidado.csv.gz"
+# Coluna normalizada (UPPER/TRIM) materializada na carga: o bot consulta por igualdade
+# simples e o B-tree é usado, ao contrário de UPPER(id_obra) = :val
+ID_NORM_COL = "id_obra_norm"
+# Hash do conteúdo de cada linha (sync incremental compara contra o valor gravado)
+ROW_HASH_COL = "row_hash"
+CHAVE_SYNC = [ID_NORM_COL, "etapa"]
+TABELA_DELTA = f"{TABELA}_delta"
+TABELA_REMOVIDOS = f"{TABELA}_removidos"
+TABELA_WATERMARK = "sync_watermark"
+# Colunas textuais da base (hash como str mesmo quando o lote só tem nulos nelas)
+COLUNAS_TEXTO = {"id_obra", "cidade", "tipo_solo", "material", "etapa"}
+
+def _sql_indices(conn, tabela=TABELA):
+    conn.execute(text(
+        f"CREATE INDEX IF NOT EXISTS idx_{tabela}_{ID_NORM_COL} ON {tabela} ({ID_NORM_COL})"
+    ))
+    conn.execute(text(f"ANALYZE {tabela}"))
+
+def criar_indices(engine):
+    """Cria o índice B-tree do ID normalizado e atualiza as estatísticas do planner."""
+    with engine.begin() as conn:
+        _sql_indices(conn)
+    logging.info(f"🗂️ Índice em {TABELA}.{ID_NORM_COL} criado.")
+
+def normalizar_para_hash(dados: pd.DataFrame) -> pd.DataFrame:
+    """
+    Tipos estáveis entre lotes antes do hash: o dtype inferido pelo read_csv muda conforme o
+    lote (um NaN transforma int64 em float64, uma coluna toda nula vira float). Texto -> str
+    (nulo = ""), demais -> float64; assim o mesmo conteúdo gera sempre o mesmo hash.
+    """
+    normalizado = {}
+    for col in dados.columns:
+        serie = dados[col]
+        if col not in COLUNAS_TEXTO and (pd.api.types.is_numeric_dtype(serie) or serie.isna().all()):
+            normalizado[col] = serie.astype("float64")
+        else:
+            normalizado[col] = serie.astype(object).where(serie.notna(), "").astype(str)
+    return pd.DataFrame(normalizado, index=dados.index)
+
+def preparar_chunk(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Normaliza nomes de colunas e materializa o ID normalizado e o hash da linha."""
+    # Garantimos que os nomes das colunas estão em minúsculo para bater com o SQL
+    chunk.columns = [c.lower() for c in chunk.columns]
+    dados = normalizar_para_hash(chunk.drop(columns=[ID_NORM_COL, ROW_HASH_COL], errors="ignore"))
+    chunk[ID_NORM_COL] = chunk["id_obra"].astype(str).str.strip().str.upper()
+    # uint64 -> int64 para caber em BIGINT
+    chunk[ROW_HASH_COL] = pd.util.hash_pandas_object(dados, index=False).to_numpy().view("int64")
+    return chunk
+
+def _serializar_chunk(chunk: pd.DataFrame):
+    """Preparo + serialização CSV (sem cabeçalho) de um lote já lido."""
+    return len(chunk), preparar_chunk(chunk).to_csv(index=False, header=False)
+
+def _processar_bloco(cabecalho: str, texto: str):
+    """Parsing + preparo + serialização de um bloco de linhas brutas; roda nos workers."""
+    return _serializar_chunk(pd.read_csv(io.StringIO(cabecalho + texto)))
+
+def _ler_blocos(path_arquivo, linhas_por_bloco: int):
+    """
+    (cabeçalho, texto) de blocos de linhas do CSV(.gz), sem parsing: o processo principal só
+    descomprime e corta por linha (gzip não permite ler faixas de bytes em paralelo). Supõe
+    campos sem quebra de linha entre aspas, como na base gerada pelo pipeline.
+    """
+    abrir = gzip.open if str(path_arquivo).endswith(".gz") else open
+    with abrir(path_arquivo, "rt", encoding="utf-8", newline="") as f:
+        cabecalho = f.readline()
+        bloco = []
+        for linha in f:
+            bloco.append(linha)
+            if len(bloco) >= linhas_por_bloco:
+                yield cabecalho, "".join(bloco)
+                bloco = []
+        if bloco:
+            yield cabecalho, "".join(bloco)
+
+def _copiar_lote(raw_conn, paramstyle: str, colunas, csv_texto: str):
+    """COPY FROM STDIN no Postgres; executemany como substituto em bancos sem COPY (SQLite)."""
+    cur = raw_conn.cursor()
+    try:
+        if hasattr(cur, "copy_expert"):
+            lista = ", ".join(f'"{c}"' for c in colunas)
+            cur.copy_expert(
+                f"COPY {TABELA_STAGING} ({lista}) FROM STDIN WITH (FORMAT csv)", io.StringIO(csv_texto)
+            )
+        else:
+            marcador = "?" if paramstyle == "qmark" else "%s"
+            marcadores = ", ".join(marcador for _ in colunas)
+            linhas = ([v if v != "" else None for v in linha] for linha in csv.reader(io.StringIO(csv_texto)))
+            cur.executemany(f"INSERT INTO {TABELA_STAGING} VALUES ({marcadores})", linhas)
+    finally:
+        cur.close()
+
+def _trocar_tabelas(engine):
+    """Troca staging -> produção numa única transação: leitores nunca veem carga parcial."""
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {TABELA}_old"))
+        if inspect(conn).has_table(TABELA):
+            conn.execute(text(f"ALTER TABLE {TABELA} RENAME TO {TABELA}_old"))
+        conn.execute(text(f"ALTER TABLE {TABELA_STAGING} RENAME TO {TABELA}"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {TABELA}_old"))
+        _sql_indices(conn)
+
+def carregar_via_copy(engine, path_arquivo=PATH_ARQUIVO, chunk_size: int = 100_000, workers: int = 1) -> int:
+    """
+    Carga em massa: lotes do CSV.gz -> COPY numa tabela staging -> swap atômico.
+    Com workers > 1 o processo principal só descomprime e corta o arquivo em blocos de linhas;
+    parsing (read_csv), preparo e serialização de cada bloco rodam num pool de processos.
+    """
+    inicio = time.perf_counter()
+    if workers > 1:
+        blocos = _ler_blocos(path_arquivo, chunk_size)
+        primeiro_bloco = next(blocos, None)
+        primeiro = pd.read_csv(io.StringIO("".join(primeiro_bloco))) if primeiro_bloco else None
+    else:
+        leitor = pd.read_csv(path_arquivo, chunksize=chunk_size)
+        primeiro = next(leitor, None)
+    if primeiro is None:
+        logging.warning(f"Arquivo vazio: {path_arquivo}")
+        return 0
+
+    # Schema da staging derivado do primeiro lote (mesmos tipos do modo 'insert')
+    primeiro = preparar_chunk(primeiro)
+    colunas = list(primeiro.columns)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {TABELA_STAGING}"))
+    primeiro.head(0).to_sql(TABELA_STAGING, engine, index=False)
+
+    def lotes_serializados(pool):
+        yield len(primeiro), primeiro.to_csv(index=False, header=False)
+        if pool is None:
+            yield from (_serializar_chunk(c) for c in leitor)
+            return
+        # Janela limitada de blocos em voo para manter a memória estável
+        em_voo = []
+        for cabecalho, texto in blocos:
+            em_voo.append(pool.submit(_processar_bloco, cabecalho, texto))
+            if len(em_voo) >= workers * 2:
+                yield em_voo.pop(0).result()
+        for f in em_voo:
+            yield f.result()
+
+    total = 0
+    raw_conn = engine.raw_connection()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for i, (n_linhas, csv_texto) in enumerate(lotes_serializados(pool)):
+            _copiar_lote(raw_conn, engine.dialect.paramstyle, colunas, csv_texto)
+            total += n_linhas
+            logging.info(f"✅ Lote {i + 1} copiado para {TABELA_STAGING}. Total: {total}")
+        raw_conn.commit()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+        if pool is not None:
+            pool.shutdown()
+
+    _trocar_tabelas(engine)
+    duracao = time.perf_counter() - inicio
+    logging.info(
+        f"🚀 {total} registros em {duracao:.2f}s ({total / max(duracao, 1e-9):,.0f} linhas/s) "
+        f"- {TABELA} substituída atomicamente."
+    )
+    return total
+
+def carregar_via_insert(engine, path_arquivo=PATH_ARQUIVO, chunk_size: int = 10000) -> int:
+    """Modo original: to_sql em lotes (INSERT multi-valores)."""
+    inicio = time.perf_counter()
+    total_registros = 0
+    primeiro_lote = True
+
+    # O 'engine.connect()' garante que a conexão está ativa
+    with engine.connect() as conn:
+        for chunk in pd.read_csv(path_arquivo, compression='gzip', chunksize=chunk_size):
+            chunk = preparar_chunk(chunk)
+
+            metodo_sql = 'replace' if primeiro_lote else 'append'
+
+            # Enviamos para a tabela 'dashboard_obras'
+            chunk.to_sql(
+                TABELA,
+                conn,
+                if_exists=metodo_sql,
+                index=False,
+                method='multi' # <-- Isso acelera muito a inserção!
+            )
+
+            total_registros += len(chunk)
+            logging.info(f"✅ Lote processado. Total no banco: {total_registros}")
+            primeiro_lote = False
+
+    criar_indices(engine)
+    duracao = time.perf_counter() - inicio
+    logging.info(f"⏱️ {total_registros / max(duracao, 1e-9):,.0f} linhas/s")
+    return total_registros
+
+def _sha256_arquivo(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+def _ler_watermark(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA_WATERMARK} (
+            tabela TEXT PRIMARY KEY,
+            sincronizado_em TIMESTAMP,
+            arquivo_sha256 TEXT,
+            inseridas BIGINT,
+            atualizadas BIGINT,
+            removidas BIGINT
+        )
+    """))
+    row = conn.execute(
+        text(f"SELECT arquivo_sha256 FROM {TABELA_WATERMARK} WHERE tabela = :t"), {"t": TABELA}
+    ).fetchone()
+    return row[0] if row else None
+
+def _gravar_watermark(conn, sha, inseridas, atualizadas, removidas):
+    conn.execute(text(f"""
+        INSERT INTO {TABELA_WATERMARK} (tabela, sincronizado_em, arquivo_sha256, inseridas, atualizadas, removidas)
+        VALUES (:t, :ts, :sha, :ins, :upd, :rem)
+        ON CONFLICT (tabela) DO UPDATE
+        SET sincronizado_em = EXCLUDED.sincronizado_em,
+            arquivo_sha256 = EXCLUDED.arquivo_sha256,
+            inseridas = EXCLUDED.inseridas,
+            atualizadas = EXCLUDED.atualizadas,
+            removidas = EXCLUDED.removidas
+    """), {"t": TABELA, "ts": datetime.now(timezone.utc).replace(tzinfo=None), "sha": sha,
+           "ins": inseridas, "upd": atualizadas, "rem": removidas})
+
+def sincronizar_incremental(engine, path_arquivo=PATH_ARQUIVO, chunk_size: int = 100_000) -> dict:
+    """
+    Sync incremental: compara o hash de cada linha (chave id_obra_norm + etapa) com o gravado,
+    faz upsert só do que é novo/alterado e remove o que saiu do arquivo.
+    Sem tabela ou sem coluna de hash (carga antiga), cai para a carga completa via COPY.
+    """
+    inicio = time.perf_counter()
+    colunas_existentes = (
+        {c["name"] for c in inspect(engine).get_columns(TABELA)}
+        if inspect(engine).has_table(TABELA) else set()
+    )
+    if ROW_HASH_COL not in colunas_existentes:
+        logging.info(f"ℹ️ {TABELA} sem coluna {ROW_HASH_COL}; executando carga completa.")
+        total = carregar_via_copy(engine, path_arquivo, chunk_size)
+        with engine.begin() as conn:
+            _ler_watermark(conn)
+            _gravar_watermark(conn, _sha256_arquivo(path_arquivo), total, 0, 0)
+        return {"inseridas": total, "atualizadas": 0, "removidas": 0}
+
+    sha = _sha256_arquivo(path_arquivo)
+    with engine.begin() as conn:
+        if _ler_watermark(conn) == sha:
+            logging.info("✅ Arquivo idêntico ao último sync (watermark); nada a fazer.")
+            return {"inseridas": 0, "atualizadas": 0, "removidas": 0}
+        armazenado = pd.DataFrame(
+            conn.execute(text(f"SELECT {', '.join(CHAVE_SYNC)}, {ROW_HASH_COL} FROM {TABELA}")).fetchall(),
+            columns=CHAVE_SYNC + ["hash_atual"],
+        )
+
+    inseridas = atualizadas = 0
+    vistos, colunas = [], []
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {TABELA_DELTA}"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {TABELA_REMOVIDOS}"))
+
+    for chunk in pd.read_csv(path_arquivo, chunksize=chunk_size):
+        chunk = preparar_chunk(chunk)
+        colunas = list(chunk.columns)
+        vistos.append(chunk[CHAVE_SYNC])
+        comp = chunk.merge(armazenado, on=CHAVE_SYNC, how="left", indicator=True)
+        novos = comp["_merge"] == "left_only"
+        alterados = ~novos & (comp[ROW_HASH_COL] != comp["hash_atual"])
+        inseridas += int(novos.sum())
+        atualizadas += int(alterados.sum())
+        delta = comp.loc[novos | alterados, chunk.columns]
+        if not delta.empty:
+            delta.to_sql(TABELA_DELTA, engine, if_exists="append", index=False, method="multi")
+
+    vistos = pd.concat(vistos, ignore_index=True) if vistos else pd.DataFrame(columns=CHAVE_SYNC)
+    removidos = armazenado.merge(vistos, on=CHAVE_SYNC, how="left", indicator=True)
+    removidos = removidos.loc[removidos["_merge"] == "left_only", CHAVE_SYNC]
+
+    chave = f"({', '.join(CHAVE_SYNC)})"
+    with engine.begin() as conn:
+        if inseridas or atualizadas:
+            lista = ", ".join(f'"{c}"' for c in colunas)
+            conn.execute(text(f"DELETE FROM {TABELA} WHERE {chave} IN (SELECT {', '.join(CHAVE_SYNC)} FROM {TABELA_DELTA})"))
+            conn.execute(text(f"INSERT INTO {TABELA} ({lista}) SELECT {lista} FROM {TABELA_DELTA}"))
+            conn.execute(text(f"DROP TABLE {TABELA_DELTA}"))
+        if not removidos.empty:
+            removidos.to_sql(TABELA_REMOVIDOS, conn, index=False, method="multi")
+            conn.execute(text(f"DELETE FROM {TABELA} WHERE {chave} IN (SELECT {', '.join(CHAVE_SYNC)} FROM {TABELA_REMOVIDOS})"))
+            conn.execute(text(f"DROP TABLE {TABELA_REMOVIDOS}"))
+        _gravar_watermark(conn, sha, inseridas, atualizadas, len(removidos))
+
+    resumo = {"inseridas": inseridas, "atualizadas": atualizadas, "removidas": len(removidos)}
+    logging.info(f"🔁 Sync incremental em {time.perf_counter() - inicio:.2f}s: {resumo}")
+    return resumo
+
+def carregar_dados_supabase(modo: str = "insert", workers: int = 1):
     load_dotenv()
-    
+
     db_url = os.getenv("DATABASE_URL")
-    
+
     if not db_url:
         logging.error("❌ Erro: DATABASE_URL não encontrada!")
         return
@@ -22,35 +335,14 @@ def carregar_dados_supabase():
     try:
         # Aumentamos o pool_size para manter a conexão estável durante a carga pesada
         engine = create_engine(db_url, pool_pre_ping=True)
-        path_arquivo = "data/processed/df_mestre_consolidado.csv.gz"
-        
-        logging.info(f"📂 Abrindo arquivo comprimido: {path_arquivo}")
-
-        chunk_size = 10000 
-        total_registros = 0
-        primeiro_lote = True
-
-        # O 'engine.connect()' garante que a conexão está ativa
-        with engine.connect() as conn:
-            for chunk in pd.read_csv(path_arquivo, compression='gzip', chunksize=chunk_size):
-                
-                # Garantimos que os nomes das colunas estão em minúsculo para bater com o SQL
-                chunk.columns = [c.lower() for c in chunk.columns]
-                
-                metodo_sql = 'replace' if primeiro_lote else 'append'
-                
-                # Enviamos para a tabela 'dashboard_obras'
-                chunk.to_sql(
-                    'dashboard_obras', 
-                    conn, 
-                    if_exists=metodo_sql, 
-                    index=False,
-                    method='multi' # <-- Isso acelera muito a inserção!
-                )
-                
-                total_registros += len(chunk)
-                logging.info(f"✅ Lote processado. Total no banco: {total_registros}")
-                primeiro_lote = False
+        logging.info(f"📂 Abrindo arquivo comprimido: {PATH_ARQUIVO} (modo {modo})")
+
+        if modo == "copy":
+            carregar_via_copy(engine, PATH_ARQUIVO, workers=workers)
+        elif modo == "sync":
+            sincronizar_incremental(engine, PATH_ARQUIVO)
+        else:
+            carregar_via_insert(engine, PATH_ARQUIVO)
 
         logging.info("🚀 Missão cumprida! O Supabase recebeu todos os dados.")
 
@@ -58,4 +350,8 @@ def carregar_dados_supabase():
         logging.error(f"❌ Falha na migração: {e}")
 
 if __name__ == "__main__":
-    carregar_dados_supabase()
+    parser = argparse.ArgumentParser(description="Carga da base consolidada no Supabase.")
+    parser.add_argument("--modo", choices=["insert", "copy", "sync"], default="insert")
+    parser.add_argument("--workers", type=int, default=1, help="Processos para parsing/serialização dos blocos (modo copy)")
+    args = parser.parse_args()
+    carregar_dados_supabase(args.modo, args.workers)
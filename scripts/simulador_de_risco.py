@@ -7,6 +7,8 @@ import numpy as np
 import joblib
 import os
 
+from inference_engine import compilar_ou_none
+
 # 1. Carregamento do Cérebro do Projeto (Pipeline + Metadados)
 MODEL_PATH = "models/pipeline_random_forest.pkl"
 META_PATH = "models/features_metadata.joblib"
@@ -17,6 +19,8 @@ else:
     # Carregamos o pipeline completo (já inclui o tratamento de dados)
     pipeline = joblib.load(MODEL_PATH)
     features_originais = joblib.load(META_PATH)
+    # Motor compilado (predições idênticas, sem overhead do Pipeline)
+    modelo = compilar_ou_none(pipeline, features_originais) or pipeline
 
     # 2. Definição do Cenário de Simulação (Exemplo de Obra de Alto Risco)
     # IMPORTANTE: Usamos minúsculo para bater com o padrão do gerador_dados.py
@@ -43,7 +47,7 @@ else:
     # 5. Predição Direta via Pipeline
     # O pipeline aplica o StandardScaler e o OneHotEncoder automaticamente!
     
-    pred_atraso = pipeline.predict(df_nova)[0]
+    pred_atraso = modelo.predict(df_nova)[0]
 
     # 6. Relatório de Diagnóstico
     print("=== 🏗️ SIMULADOR DE RISCO CCBJJ ===")
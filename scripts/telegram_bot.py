@@ -3,26 +3,26 @@ import sys
 import io
 import joblib
 import pandas as pd
+import numpy as np
 import pytz
 import logging
 import warnings
 import asyncio
+import time
+import json
+import threading
+import unicodedata
+from collections import deque
+from contextlib import asynccontextmanager
 from pathlib import Path
 from datetime import datetime
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, inspect, text
 
 # 1. CONFIGURAÇÕES DE AMBIENTE E SEGURANÇA
 os.environ['MPLCONFIGDIR'] = '/tmp/matplotlib'
 warnings.filterwarnings("ignore", category=UserWarning)
 
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-from reportlab.lib.utils import ImageReader
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import cm
-
+# matplotlib e reportlab são importados sob demanda (primeiro relatório), fora do cold start
 # Ajuste de Path para módulos locais
 current_dir = Path(__file__).resolve().parent
 if str(current_dir) not in sys.path:
@@ -37,9 +37,17 @@ from telegram.ext import (
     CallbackQueryHandler, ContextTypes, filters
 )
 
-import database
+import async_database
 from i18n import get_text
 from handlers import start_command, help_command, settings_command
+from prediction_cache import PredictionCache, hash_linhas, fingerprint_modelo
+from base_colunar import carregar_base, BaseCompacta, relatorio_memoria
+from inference_engine import compilar_ou_none, carregar_motor
+from grafico_risco import RenderizadorGrafico
+from relatorio_pdf import get_template
+from pool_renderizacao import PoolRenderizacao
+from controle_fluxo import CoalescedorRequisicoes, LimitadorTokenBucket
+from ranking_portfolio import RankingRisco
 
 # Configurações Globais
 BR_TIMEZONE = pytz.timezone('America/Sao_Paulo')
@@ -47,24 +55,315 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 LOGO_PATH = BASE_DIR / "assets" / "logo_ccbjj.png"
 PIPELINE_PATH = BASE_DIR / "models" / "pipeline_random_forest.pkl"
 FEATURES_PATH = BASE_DIR / "models" / "features_metadata.joblib"
+MOTOR_PATH = BASE_DIR / "models" / "motor_inferencia.joblib"
 DB_PATH = BASE_DIR / "data" / "processed" / "df_mestre_consolidado.csv.gz"
 
-# Cache de Recursos (Lazy Loading)
-RESOURCES = {"pipeline": None, "features": None, "df_base": None, "engine": None}
+# Cache de Recursos (pré-carregados no startup; lazy loading como fallback)
+RESOURCES = {
+    "pipeline": None, "motor": None, "features": None, "df_base": None, "obra_index": None,
+    "engine": None, "supabase_query": None, "pred_cache": None, "ranking": None,
+    "versao_modelo": None, "referencia_fatores": None
+}
+
+# Latência medida das consultas ao Supabase (atualizada pelas threads do to_thread, sob lock;
+# resumo com percentis das últimas consultas exposto no /ready)
+SUPABASE_LATENCY = {"count": 0, "total_ms": 0.0, "last_ms": None, "max_ms": 0.0}
+SUPABASE_LATENCY_AMOSTRAS = deque(maxlen=int(os.getenv("SUPABASE_LATENCY_WINDOW", "1000")))
+_SUPABASE_LATENCY_LOCK = threading.Lock()
+
+# Estado de prontidão (pré-carga no startup) e lock da carga única
+READINESS = {"ready": False, "error": None, "stages_ms": {}, "total_ms": None}
+_RESOURCES_LOCK = threading.Lock()
+
+# Gráficos: figura base por idioma montada uma vez, PNGs em cache (matplotlib importado sob demanda)
+RENDERIZADOR_GRAFICO = RenderizadorGrafico()
+# Executor limitado só para gráfico/PDF (não disputa o executor padrão com a predição)
+RENDER_POOL = PoolRenderizacao()
+
+# Coalescência de requisições idênticas em andamento + limite por usuário
+COALESCEDOR = CoalescedorRequisicoes()
+LIMITADOR = LimitadorTokenBucket()
+
+def normalizar_id_obra(id_obra) -> str:
+    """Normalização única de IDs (mesma regra para índice e mensagens)."""
+    return str(id_obra).strip().upper()
+
+def buscar_obra_csv(res: dict, id_obra: str) -> pd.DataFrame:
+    """Busca O(1) no índice em memória (fatia contígua das etapas da obra)."""
+    posicoes = res["obra_index"].get(normalizar_id_obra(id_obra))
+    if posicoes is None:
+        return res["df_base"].iloc[0:0]
+    return res["df_base"].iloc[posicoes]
+
+def tem_coluna_normalizada(engine) -> bool:
+    """Tabelas carregadas pelo setup_database antigo não têm id_obra_norm (detectado uma vez)."""
+    try:
+        return "id_obra_norm" in {c["name"] for c in inspect(engine).get_columns("dashboard_obras")}
+    except Exception:
+        logging.exception("Não foi possível inspecionar dashboard_obras; usando filtro UPPER(TRIM(id_obra))")
+        return False
+
+def montar_query_supabase(features, coluna_normalizada: bool = True):
+    """SELECT só das colunas do modelo, filtrando pela coluna normalizada indexada (ou fallback)."""
+    colunas = ", ".join(f'"{c}"' for c in features)
+    if coluna_normalizada:
+        return text(f"SELECT {colunas} FROM dashboard_obras WHERE id_obra_norm = :val")
+    logging.warning(
+        "dashboard_obras sem id_obra_norm: consultas por UPPER(TRIM(id_obra)) (sem índice). "
+        "Recarregue a tabela com scripts/setup_database.py para usar a coluna indexada."
+    )
+    return text(f"SELECT {colunas} FROM dashboard_obras WHERE UPPER(TRIM(id_obra)) = :val")
+
+def buscar_obra_supabase(res: dict, id_obra: str) -> pd.DataFrame:
+    """Consulta direta no pool (sem pd.read_sql) com medição de latência."""
+    inicio = time.perf_counter()
+    with res["engine"].connect() as conn:
+        result = conn.execute(res["supabase_query"], {"val": normalizar_id_obra(id_obra)})
+        df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    ms = (time.perf_counter() - inicio) * 1000
+    registrar_latencia_supabase(ms)
+    logging.info(f"Supabase lookup {id_obra}: {ms:.1f} ms ({len(df)} linhas)")
+    return df
+
+def registrar_latencia_supabase(ms: float):
+    with _SUPABASE_LATENCY_LOCK:
+        SUPABASE_LATENCY["count"] += 1
+        SUPABASE_LATENCY["total_ms"] += ms
+        SUPABASE_LATENCY["last_ms"] = ms
+        SUPABASE_LATENCY["max_ms"] = max(SUPABASE_LATENCY["max_ms"], ms)
+        SUPABASE_LATENCY_AMOSTRAS.append(ms)
+
+def resumo_latencia_supabase() -> dict:
+    """Contagem, média e máximo acumulados + p50/p95/p99 da janela recente (ms)."""
+    with _SUPABASE_LATENCY_LOCK:
+        stats = dict(SUPABASE_LATENCY)
+        amostras = list(SUPABASE_LATENCY_AMOSTRAS)
+    stats["mean_ms"] = stats["total_ms"] / stats["count"] if stats["count"] else None
+    if amostras:
+        p50, p95, p99 = np.percentile(amostras, [50, 95, 99])
+        stats.update(p50_ms=float(p50), p95_ms=float(p95), p99_ms=float(p99), janela=len(amostras))
+    return stats
+
+def _carregar_recursos(etapas_ms: dict):
+    """Carga completa dos recursos, cronometrando cada etapa (ms)."""
+    def cronometrar(etapa, inicio):
+        etapas_ms[etapa] = (time.perf_counter() - inicio) * 1000
+
+    inicio = time.perf_counter()
+    RESOURCES["features"] = joblib.load(FEATURES_PATH)
+    cronometrar("metadata", inicio)
+
+    # Motor mmap (uma cópia física compartilhada entre workers via page cache);
+    # sem artefato válido: unpickle do pipeline + compilação (None -> pipeline.predict)
+    inicio = time.perf_counter()
+    RESOURCES["motor"] = carregar_motor(PIPELINE_PATH, MOTOR_PATH)
+    if RESOURCES["motor"] is None:
+        # Fingerprint lido ANTES do unpickle: é a versão que fica em memória
+        RESOURCES["versao_modelo"] = fingerprint_modelo(PIPELINE_PATH)
+        RESOURCES["pipeline"] = joblib.load(PIPELINE_PATH)
+        RESOURCES["motor"] = compilar_ou_none(RESOURCES["pipeline"], RESOURCES["features"])
+    else:
+        # Artefato mmap já validado contra o .pkl (mesmo fingerprint)
+        RESOURCES["versao_modelo"] = RESOURCES["motor"].versao_modelo
+    cronometrar("model", inicio)
+
+    # Parquet com projeção de colunas (fallback automático para o CSV.gz)
+    inicio = time.perf_counter()
+    base = carregar_base(["id_obra"] + list(RESOURCES["features"]), csv_path=DB_PATH)
+    if "id_obra" not in base.columns:
+        base = pd.DataFrame(columns=["id_obra"])
+    # Base compacta (IDs internados + offsets) que também serve de índice hash O(1)
+    # Features do modelo seguem em float64 (mesmos valores do modo Supabase)
+    compacta = BaseCompacta(base, preservar=RESOURCES["features"])
+    relatorio_memoria(base, compacta)
+    RESOURCES["df_base"] = compacta.df
+    RESOURCES["obra_index"] = compacta
+    del base
+    if RESOURCES["motor"] is None:
+        # Sem motor (ex.: HistGradientBoosting): referência dos fatores por perturbação
+        RESOURCES["referencia_fatores"] = valores_referencia(RESOURCES["df_base"], RESOURCES["features"])
+    # Cache chaveado pela versão carregada: um re-treino em disco não recebe predições do modelo antigo
+    RESOURCES["pred_cache"] = PredictionCache(PIPELINE_PATH, model_version=RESOURCES["versao_modelo"])
+    if os.getenv("PREDICTION_CACHE_WARM", "0") == "1":
+        RESOURCES["pred_cache"].warm(
+            RESOURCES["df_base"], RESOURCES["features"], RESOURCES["motor"] or RESOURCES["pipeline"],
+            classificar_risco, RESOURCES["obra_index"]
+        )
+    cronometrar("base", inicio)
+
+    # Ranking do portfólio (/portfolio): predição em lote + listas ordenadas por grupo
+    inicio = time.perf_counter()
+    RESOURCES["ranking"] = RankingRisco()
+    if os.getenv("PORTFOLIO_RANKING", "1") == "1":
+        RESOURCES["ranking"].construir(
+            RESOURCES["df_base"], RESOURCES["obra_index"], RESOURCES["features"],
+            RESOURCES["motor"] or RESOURCES["pipeline"] or joblib.load(PIPELINE_PATH)
+        )
+    cronometrar("ranking", inicio)
+
+    inicio = time.perf_counter()
+    db_url = os.getenv("DATABASE_URL")
+    if db_url:
+        RESOURCES["engine"] = create_engine(
+            db_url.replace("postgres://", "postgresql://"),
+            pool_size=5, max_overflow=10, pool_pre_ping=True,
+            future=True
+        )
+        RESOURCES["supabase_query"] = montar_query_supabase(
+            RESOURCES["features"], tem_coluna_normalizada(RESOURCES["engine"])
+        )
+    cronometrar("engine", inicio)
 
 def get_resources():
-    if RESOURCES["pipeline"] is None:
-        RESOURCES["pipeline"] = joblib.load(PIPELINE_PATH)
-        RESOURCES["features"] = joblib.load(FEATURES_PATH)
-        RESOURCES["df_base"] = pd.read_csv(DB_PATH, compression="gzip")
-        db_url = os.getenv("DATABASE_URL")
-        if db_url:
-            RESOURCES["engine"] = create_engine(
-                db_url.replace("postgres://", "postgresql://"),
-                future=True
+    """Recursos prontos; carga única protegida por lock (sem corrida entre requisições)."""
+    if READINESS["ready"]:
+        return RESOURCES
+    with _RESOURCES_LOCK:
+        if not READINESS["ready"]:
+            etapas_ms = {}
+            inicio = time.perf_counter()
+            try:
+                _carregar_recursos(etapas_ms)
+            except Exception as e:
+                READINESS["error"] = repr(e)
+                raise
+            READINESS.update(
+                ready=True, error=None, stages_ms=etapas_ms,
+                total_ms=(time.perf_counter() - inicio) * 1000
+            )
+            logging.info(
+                "🚀 Recursos carregados em %.0f ms (%s)", READINESS["total_ms"],
+                ", ".join(f"{k}={v:.0f}ms" for k, v in etapas_ms.items())
             )
     return RESOURCES
 
+async def preload_resources():
+    """Fase de startup: carrega tudo fora do event loop antes de reportar prontidão."""
+    try:
+        await asyncio.to_thread(get_resources)
+    except Exception:
+        logging.exception("Falha no pré-carregamento dos recursos")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Lifespan do FastAPI/uvicorn: DB e recursos no startup, pool assíncrono fechado no shutdown."""
+    await async_database.init_db()
+    await preload_resources()
+    yield
+    RENDER_POOL.shutdown()
+    await async_database.dispose()
+
+async def readiness(request: Request) -> Response:
+    """200 quando os recursos estão carregados; 503 (com o erro, se houver) caso contrário."""
+    corpo = {k: READINESS[k] for k in ("ready", "error", "stages_ms", "total_ms")}
+    corpo["render"] = RENDER_POOL.stats()
+    corpo["coalescencia"] = COALESCEDOR.stats()
+    corpo["rate_limit"] = LIMITADOR.stats()
+    corpo["supabase_latencia"] = resumo_latencia_supabase()
+    corpo["ranking_obras"] = len(RESOURCES["ranking"]) if RESOURCES["ranking"] is not None else 0
+    cache = RESOURCES["pred_cache"]
+    corpo["modelo"] = {
+        "versao_carregada": RESOURCES["versao_modelo"],
+        "versao_em_disco": cache.versao_em_disco if cache is not None else None,
+        "reinicio_pendente": cache.desatualizado if cache is not None else False,
+    }
+    return Response(
+        content=json.dumps(corpo), media_type="application/json",
+        status_code=200 if READINESS["ready"] else 503
+    )
+
+def registrar_readiness(app: FastAPI, path: str = "/ready"):
+    """Expõe o endpoint de prontidão (health check do orquestrador)."""
+    app.add_api_route(path, readiness, methods=["GET"])
+
+def classificar_risco(risco_val: float) -> str:
+    return "🟢 NORMAL" if risco_val <= 7 else "🟡 ALERTA" if risco_val <= 10 else "🔴 CRÍTICO"
+
+N_FATORES = int(os.getenv("REPORT_TOP_DRIVERS", "3"))
+
+def _rotulo_fator(X: pd.DataFrame, coluna: str) -> str:
+    """'coluna = valor' quando a obra tem um único valor (ex.: tipo_solo); senão só a coluna."""
+    valores = X[coluna].unique()
+    if len(valores) != 1:
+        return coluna
+    valor = valores[0]
+    return f"{coluna} = {valor:g}" if isinstance(valor, (int, float, np.number)) else f"{coluna} = {valor}"
+
+def valores_referencia(df: pd.DataFrame, features: list) -> dict:
+    """Valor típico de cada feature na base (mediana numérica, moda categórica)."""
+    ref = {}
+    for col in features:
+        if col not in df.columns or df[col].dropna().empty:
+            continue
+        serie = df[col].dropna()
+        ref[col] = float(serie.median()) if pd.api.types.is_numeric_dtype(serie) else serie.mode().iloc[0]
+    return ref
+
+def contribuicoes_perturbacao(modelo, X: pd.DataFrame, referencia: dict) -> pd.Series:
+    """
+    Fatores sem motor compilado (qualquer família de modelo): efeito de trocar uma feature
+    por vez pelo valor de referência da base, médio entre as etapas. Um único predict em lote.
+    """
+    cols = [c for c in X.columns if c in referencia]
+    blocos = [X] + [X.assign(**{c: referencia[c]}) for c in cols]
+    preds = np.asarray(modelo.predict(pd.concat(blocos, ignore_index=True)), dtype=float)
+    preds = preds.reshape(len(blocos), len(X)).mean(axis=1)
+    return pd.Series(preds[0] - preds[1:], index=cols)
+
+def explicar_obra(res: dict, X: pd.DataFrame) -> tuple:
+    """
+    Principais fatores do risco da obra: contribuições por caminho nas árvores (motor
+    compilado), média entre as etapas como a própria predição. Sem motor: perturbação
+    uma-a-uma contra os valores de referência da base, via pipeline.
+    """
+    if N_FATORES <= 0:
+        return ()
+    if res["motor"] is not None:
+        _, contrib = res["motor"].contribuicoes(X)
+        media = contrib.mean()
+    elif res["pipeline"] is not None and res.get("referencia_fatores"):
+        media = contribuicoes_perturbacao(res["pipeline"], X, res["referencia_fatores"])
+    else:
+        logging.warning("⚠️ Fatores de risco indisponíveis (sem motor nem referência da base); relatório sem fatores")
+        return ()
+    top = media.reindex(media.abs().sort_values(ascending=False).index[:N_FATORES])
+    return tuple((_rotulo_fator(X, col), float(dias)) for col, dias in top.items() if abs(dias) >= 0.005)
+
+async def _explicar(res: dict, X: pd.DataFrame) -> tuple:
+    """Motor: direto no event loop (sub-milissegundo). Pipeline: predict em lote numa thread."""
+    if res["motor"] is not None:
+        return explicar_obra(res, X)
+    return await asyncio.to_thread(explicar_obra, res, X)
+
+async def prever_obra(res: dict, id_obra: str, df: pd.DataFrame):
+    """Predição + principais fatores, com cache (id_obra + versão do modelo + hash das linhas)."""
+    X = df.reindex(columns=res["features"], fill_value=0)
+    row_hash = hash_linhas(X)
+    cache = res["pred_cache"]
+    item = cache.get(id_obra, row_hash)
+    if item is not None:
+        if item.fatores is not None:
+            return item.risco, item.status, item.fatores
+        # Entrada do aquecimento em lote (sem fatores): completa uma vez e regrava
+        fatores = await _explicar(res, X)
+        cache.put(id_obra, row_hash, item.risco, item.status, fatores)
+        return item.risco, item.status, fatores
+
+    if res["motor"] is not None:
+        # Sub-milissegundo: roda direto no event loop, sem custo de thread
+        prediction = res["motor"].predict(X)
+    else:
+        prediction = await asyncio.to_thread(res["pipeline"].predict, X)
+    risco_val = float(prediction.mean())
+    status = classificar_risco(risco_val)
+    fatores = await _explicar(res, X)
+    cache.put(id_obra, row_hash, risco_val, status, fatores)
+    # Predição nova (miss): reposiciona a obra no ranking do portfólio
+    if res["ranking"] is not None and "etapa" in X.columns:
+        cidade = str(X["cidade"].iloc[0]) if "cidade" in X.columns else None
+        res["ranking"].atualizar(id_obra, dict(zip(X["etapa"].astype(str), prediction)), cidade)
+    return risco_val, status, fatores
+
 # --- AUXILIARES DE INTERFACE ---
 def obter_menu_infra():
     keyboard = [[
@@ -75,88 +374,122 @@ def obter_menu_infra():
 
 # --- GERADORES DE MÍDIA ---
 def gerar_grafico_ia(risco_valor, id_obra, lang):
-    plt.style.use('ggplot')
-    fig, ax = plt.subplots(figsize=(10, 5))
-    cor = 'green' if risco_valor <= 7 else 'orange' if risco_valor <= 10 else 'red'
-
-    ax.barh(['Impacto'], [risco_valor], color=cor, height=0.5)
-    ax.set_xlim(0, 15)
-    ax.set_title(f"{get_text(lang, 'chart_title')}: {id_obra}", fontsize=12, fontweight='bold')
-
-    plt.figtext(0.15, 0.02, get_text(lang, "chart_legend"),
-                fontsize=9, bbox=dict(facecolor='white', alpha=0.5))
-
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight', dpi=100)
-    buf.seek(0)
-    plt.close(fig)
-    return buf
-
-def gerar_pdf_corporativo(id_obra, risco, status, modo, graf_buf, lang):
-    pdf_buf = io.BytesIO()
-    c = canvas.Canvas(pdf_buf, pagesize=A4)
-    width, height = A4
+    """PNG do gráfico de impacto (template OO por idioma + cache; seguro entre threads)."""
+    return RENDERIZADOR_GRAFICO.render(risco_valor, id_obra, lang)
+
+def gerar_pdf_corporativo(id_obra, risco, status, modo, graf_buf, lang, fatores=()):
+    """PDF sobre o template em cache (logo já reduzido, textos fixos resolvidos)."""
     now_br = datetime.now(BR_TIMEZONE).strftime('%d/%m/%Y %H:%M')
+    return get_template(LOGO_PATH).render(id_obra, risco, status, modo, graf_buf, lang, now_br, fatores)
 
-    # Cabeçalho com Logo
-    if LOGO_PATH.exists():
-        c.drawImage(str(LOGO_PATH), width/2 - 2*cm, height - 4*cm,
-                    width=4*cm, preserveAspectRatio=True)
-    else:
-        logging.warning(f"Logo não encontrado em {LOGO_PATH}")
-
-    c.setFont("Helvetica-Bold", 20)
-    c.drawCentredString(width/2, height - 6*cm, "CCBJJ ENGENHARIA")
-    c.setFont("Helvetica", 14)
-    c.drawCentredString(width/2, height - 7*cm, get_text(lang, "pdf_title"))
-    c.line(2*cm, height - 8*cm, width - 2*cm, height - 8*cm)
-
-    # Conteúdo Detalhado
-    text_obj = c.beginText(2*cm, height - 9.5*cm)
-    text_obj.setFont("Helvetica-Bold", 12)
-    text_obj.textLine(get_text(lang, "pdf_section_1"))
-    text_obj.setFont("Helvetica", 11)
-    text_obj.textLine(f"• ID: {id_obra}")
-    text_obj.textLine(f"• Status: {status}")
-    text_obj.textLine(f"• Impacto: {risco:.2f} dias")
-    text_obj.textLine(f"• Fonte: {modo} | Data: {now_br}")
-
-    text_obj.moveCursor(0, 15)
-    text_obj.setFont("Helvetica-Bold", 12)
-    text_obj.textLine(get_text(lang, "pdf_section_2"))
-    text_obj.setFont("Helvetica", 11)
-    text_obj.textLine("Análise preditiva baseada em algoritmos de Machine Learning (Random Forest).")
-    c.drawText(text_obj)
-
-    # Imagem do Gráfico
-    graf_buf.seek(0)
-    img_reader = ImageReader(graf_buf)
-    c.drawImage(img_reader, 2*cm, height - 20*cm, width=17*cm, preserveAspectRatio=True)
-
-    c.setFont("Helvetica-Oblique", 8)
-    c.drawCentredString(width/2, 2*cm, get_text(lang, "pdf_footer"))
-
-    c.showPage()
-    c.save()
-    pdf_buf.seek(0)
-    return pdf_buf
+# --- PIPELINE DE RESPOSTA ---
+async def _cronometrar(etapas_ms: dict, nome: str, coro):
+    inicio = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        etapas_ms[nome] = (time.perf_counter() - inicio) * 1000
+
+async def enviar_relatorio(update: Update, id_obra, risco_val, status, modo, lang, fatores=()):
+    """
+    Texto, gráfico e PDF em paralelo: a renderização começa assim que a predição existe e
+    se sobrepõe aos uploads. Falha de um artefato não cancela os demais.
+    """
+    etapas_ms = {}
+    inicio = time.perf_counter()
+
+    # Renderizações coalescidas por (obra, idioma, modo): mensagens duplicadas simultâneas
+    # reaproveitam os mesmos bytes; cada requisição faz apenas os próprios uploads
+    chave = (id_obra, lang, modo)
+
+    async def render_grafico():
+        graf_buf = await RENDER_POOL.executar(gerar_grafico_ia, risco_val, id_obra, lang)
+        return graf_buf.getvalue()
+
+    async def render_pdf():
+        try:
+            png = await COALESCEDOR.executar(chave + ("grafico",), render_grafico)
+            graf_buf = io.BytesIO(png)
+        except Exception:
+            graf_buf = None  # PDF sai sem o gráfico
+        pdf_buf = await RENDER_POOL.executar(
+            gerar_pdf_corporativo, id_obra, risco_val, status, modo, graf_buf, lang, fatores
+        )
+        return pdf_buf.getvalue()
+
+    tarefa_grafico = asyncio.ensure_future(_cronometrar(
+        etapas_ms, "render_grafico", COALESCEDOR.executar(chave + ("grafico",), render_grafico)
+    ))
+    tarefa_pdf = asyncio.ensure_future(_cronometrar(
+        etapas_ms, "render_pdf", COALESCEDOR.executar(chave + ("pdf",), render_pdf)
+    ))
+
+    linhas_fatores = "".join(
+        f"\n{get_text(lang, 'driver_line', fator=rotulo, dias=dias)}" for rotulo, dias in fatores
+    )
+    bloco_fatores = f"\n\n{get_text(lang, 'report_drivers')}{linhas_fatores}" if fatores else ""
+
+    async def enviar_texto():
+        await _cronometrar(etapas_ms, "envio_texto", update.message.reply_text(
+            f"{get_text(lang, 'report_header')}\n"
+            f"ID: `{id_obra}`\n"
+            f"{get_text(lang, 'report_status', status=status)}\n"
+            f"{get_text(lang, 'report_impact', risco=risco_val)}{bloco_fatores}\n\n"
+            f"{get_text(lang, 'report_note', status=status)}",
+            parse_mode=ParseMode.MARKDOWN
+        ))
+
+    async def enviar_grafico():
+        # BytesIO próprio por upload (bytes compartilhados entre requisições coalescidas)
+        graf_buf = io.BytesIO(await tarefa_grafico)
+        await _cronometrar(etapas_ms, "envio_grafico", update.message.reply_photo(photo=graf_buf))
+
+    async def enviar_pdf():
+        pdf_buf = io.BytesIO(await tarefa_pdf)
+        await _cronometrar(etapas_ms, "envio_pdf", update.message.reply_document(
+            document=InputFile(pdf_buf, filename=f"Relatorio_{id_obra}.pdf"),
+            caption=get_text(lang, "sending_files"),
+            parse_mode=ParseMode.MARKDOWN
+        ))
+
+    resultados = await asyncio.gather(enviar_texto(), enviar_grafico(), enviar_pdf(), return_exceptions=True)
+    falhas = [r for r in resultados if isinstance(r, Exception)]
+    for nome, r in zip(("texto", "grafico", "pdf"), resultados):
+        if isinstance(r, Exception):
+            logging.error(f"Falha no envio ({nome}) da obra {id_obra}", exc_info=r)
+
+    logging.info(
+        "📨 Resposta %s em %.0f ms (%s)", id_obra, (time.perf_counter() - inicio) * 1000,
+        ", ".join(f"{k}={v:.0f}ms" for k, v in etapas_ms.items())
+    )
+    if falhas:
+        await update.message.reply_text(get_text(lang, "internal_error"))
 
 # --- CORE HANDLERS ---
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    lang = database.get_language(user_id)
-    modo = database.get_storage_mode(user_id)
-    id_obra = update.message.text.strip().upper()
+    settings = await async_database.get_user_settings(user_id)
+    lang, modo = settings["language"], settings["storage_mode"]
+    id_obra = normalizar_id_obra(update.message.text)
+
+    # Token bucket por usuário: rajadas não saturam a CPU do dyno
+    if not LIMITADOR.permitir(user_id):
+        espera = LIMITADOR.espera_segundos(user_id)
+        logging.info(f"Rate limit: usuário {user_id} bloqueado ({espera:.0f}s)")
+        await update.message.reply_text(get_text(lang, "rate_limited", segundos=max(1, round(espera))))
+        return
 
-    res = get_resources()
+    # Normalmente já pré-carregado; se não, carrega fora do event loop (lock evita carga dupla)
+    res = RESOURCES if READINESS["ready"] else await asyncio.to_thread(get_resources)
 
     try:
-        # Busca Segura
+        # Busca Segura (consultas simultâneas da mesma obra/modo viram uma só)
         if modo == "SUPABASE" and res["engine"]:
-            query = text("SELECT * FROM dashboard_obras WHERE UPPER(id_obra) = :val")
-            df = pd.read_sql(query, res["engine"], params={"val": id_obra})
+            df = await COALESCEDOR.executar(
+                ("consulta", id_obra, modo), lambda: asyncio.to_thread(buscar_obra_supabase, res, id_obra)
+            )
         else:
-            df = res["df_base"][res["df_base"]["id_obra"].str.upper() == id_obra]
+            df = buscar_obra_csv(res, id_obra)
 
         if df.empty:
             await update.message.reply_text(
@@ -168,37 +501,77 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             get_text(lang, "processing"), parse_mode=ParseMode.MARKDOWN
         )
 
-        X = df.reindex(columns=res["features"], fill_value=0)
-        prediction = await asyncio.to_thread(res["pipeline"].predict, X)
-        risco_val = float(prediction.mean())
-        status = "🟢 NORMAL" if risco_val <= 7 else "🟡 ALERTA" if risco_val <= 10 else "🔴 CRÍTICO"
-
-        await update.message.reply_text(
-            f"{get_text(lang, 'report_header')}\n"
-            f"ID: `{id_obra}`\n"
-            f"{get_text(lang, 'report_status', status=status)}\n"
-            f"{get_text(lang, 'report_impact', risco=risco_val)}\n\n"
-            f"{get_text(lang, 'report_note', status=status)}",
-            parse_mode=ParseMode.MARKDOWN
+        risco_val, status, fatores = await COALESCEDOR.executar(
+            ("predicao", id_obra, modo), lambda: prever_obra(res, id_obra, df)
         )
 
-        graf_buf = await asyncio.to_thread(gerar_grafico_ia, risco_val, id_obra, lang)
-        await update.message.reply_photo(photo=graf_buf)
-
-        pdf_buf = await asyncio.to_thread(
-            gerar_pdf_corporativo, id_obra, risco_val, status, modo, graf_buf, lang
-        )
-        await update.message.reply_document(
-            document=InputFile(pdf_buf, filename=f"Relatorio_{id_obra}.pdf"),
-            caption=get_text(lang, "sending_files"),
-            parse_mode=ParseMode.MARKDOWN
-        )
-        await wait_msg.delete()
+        try:
+            await enviar_relatorio(update, id_obra, risco_val, status, modo, lang, fatores)
+        finally:
+            await wait_msg.delete()
 
     except Exception as e:
         logging.exception(f"Erro ao processar ID {id_obra}")
         await update.message.reply_text(get_text(lang, "internal_error"))
 
+PORTFOLIO_TOP_PADRAO = 10
+PORTFOLIO_TOP_MAX = 50
+
+def normalizar_texto(texto: str) -> str:
+    """Minúsculas, sem acentos (NFKD sem marcas combinantes) e espaços únicos: 'São  Paulo' -> 'sao paulo'."""
+    decomposto = unicodedata.normalize("NFKD", str(texto))
+    sem_acento = "".join(c for c in decomposto if not unicodedata.combining(c))
+    return " ".join(sem_acento.casefold().split())
+
+def interpretar_filtro_portfolio(args, ranking: RankingRisco):
+    """'/portfolio [N] [cidade|etapa]' -> (n, cidade, etapa); filtro por nome sem acento/caixa."""
+    n, resto = PORTFOLIO_TOP_PADRAO, []
+    for arg in args:
+        if arg.isdigit():
+            n = min(max(int(arg), 1), PORTFOLIO_TOP_MAX)
+        else:
+            resto.append(arg)
+    filtro = " ".join(resto).strip()
+    chave = normalizar_texto(filtro)
+    if not chave:
+        return n, None, None
+    for etapa in ranking.valores_grupo("etapa"):
+        if normalizar_texto(etapa) == chave:
+            return n, None, etapa
+    for cidade in ranking.valores_grupo("cidade"):
+        if normalizar_texto(cidade) == chave:
+            return n, cidade, None
+    return n, filtro, None  # filtro desconhecido -> ranking vazio (mensagem própria)
+
+async def portfolio_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Top-N obras mais arriscadas do portfólio, servido do ranking em memória."""
+    user_id = update.effective_user.id
+    lang = await async_database.get_language(user_id)
+    msg = update.effective_message
+    if not LIMITADOR.permitir(user_id):
+        espera = LIMITADOR.espera_segundos(user_id)
+        await msg.reply_text(get_text(lang, "rate_limited", segundos=max(1, round(espera))))
+        return
+
+    res = RESOURCES if READINESS["ready"] else await asyncio.to_thread(get_resources)
+    n, cidade, etapa = interpretar_filtro_portfolio(context.args or [], res["ranking"])
+    inicio = time.perf_counter()
+    top = res["ranking"].top(n, cidade=cidade, etapa=etapa)
+    logging.info(f"/portfolio {n} cidade={cidade} etapa={etapa}: {len(top)} obras em "
+                 f"{(time.perf_counter() - inicio) * 1000:.2f} ms")
+
+    filtro = cidade or etapa or get_text(lang, "portfolio_all")
+    if not top:
+        await msg.reply_text(get_text(lang, "portfolio_empty", filtro=filtro))
+        return
+    linhas = [get_text(lang, "portfolio_header", n=len(top), filtro=filtro)]
+    for pos, item in enumerate(top, start=1):
+        linhas.append(
+            f"{pos}. `{item['id_obra']}` — {item['risco']:.2f} d {classificar_risco(item['risco'])[0]}"
+            f" | {item['cidade']} | {item['pior_etapa']}"
+        )
+    await msg.reply_text("\n".join(linhas), parse_mode=ParseMode.MARKDOWN)
+
 # --- CALLBACKS ---
 async def language_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
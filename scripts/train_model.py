@@ -2,29 +2,85 @@ import pandas as pd
 import numpy as np
 import joblib
 import os
+import json
+import math
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import train_test_split, KFold, ParameterGrid
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor, HistGradientBoostingRegressor
 from sklearn.pipeline import Pipeline
 from sklearn.compose import ColumnTransformer
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.impute import SimpleImputer # Importante para segurança
 from sklearn.metrics import mean_absolute_error, r2_score
 
+from inference_engine import compilar_ou_none, exportar
+from prediction_cache import fingerprint_modelo
+
 # 1. Configurações de Caminhos Sincronizados
 # Agora usamos o dado PROCESSADO pela célula 18
 DATA_PATH = "data/processed/df_mestre_consolidado.csv"
 MODEL_PATH = "models/pipeline_random_forest.pkl"
 META_PATH = "models/features_metadata.joblib"
+MOTOR_PATH = "models/motor_inferencia.joblib"  # arrays planos p/ carga com mmap_mode='r'
+TUNING_REPORT_PATH = "reports/tuning_train_model.json"
 os.makedirs("models", exist_ok=True)
 
-def train():
-    print("🚀 Iniciando treinamento do modelo CCbjj IA...")
+CAT_FEATURES = ['cidade', 'tipo_solo', 'material', 'etapa']
 
-    # 2. Carregamento dos dados
+# Modo de tuning (successive halving): espaço de busca e orçamento
+GRADE_FLORESTA = {
+    "n_estimators": [100, 300],
+    "max_depth": [8, 12, None],
+    "min_samples_leaf": [1, 2, 5],
+}
+GRADE_BOOSTING = {
+    "learning_rate": [0.05, 0.1],
+    "max_leaf_nodes": [15, 31, 63],
+}
+N_FOLDS = 3
+FATOR_HALVING = 3          # a cada rodada: 1/3 dos candidatos, 3x as linhas
+MIN_LINHAS_RODADA = 300    # piso da 1ª rodada (bases pequenas)
+TOLERANCIA_MAE = 0.02      # aceita MAE até 2% acima do melhor...
+GANHO_LATENCIA = 0.8       # ...se servir a consulta em <= 80% do tempo do melhor
+LOTE_LATENCIA = 3          # linhas por consulta do bot (uma obra = suas etapas)
+
+def regressor_padrao():
+    """Floresta de produção (configuração fixa do treino padrão)."""
+    return RandomForestRegressor(
+        n_estimators=300,
+        max_depth=12,
+        min_samples_leaf=2,
+        random_state=42,
+        n_jobs=-1
+    )
+
+def montar_preprocessor(cat_features, num_features):
+    # Adicionamos SimpleImputer para que o modelo não quebre se houver nulos em produção
+    numeric_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='median')),
+        ('scaler', StandardScaler())
+    ])
+
+    categorical_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='constant', fill_value='desconhecido')),
+        ('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=False))
+    ])
+
+    return ColumnTransformer(
+        transformers=[
+            ('cat', categorical_transformer, cat_features),
+            ('num', numeric_transformer, num_features)
+        ])
+
+def carregar_dados():
+    """(X, y) já normalizados, ou None se a base processada não existir."""
     if not os.path.exists(DATA_PATH):
         print(f"❌ Erro: Arquivo processado {DATA_PATH} não encontrado. Rode consolidar_base.py primeiro.")
-        return
+        return None
 
     df = pd.read_csv(DATA_PATH)
 
@@ -39,52 +95,39 @@ def train():
     # Removemos colunas que não são preditivas (IDs)
     X = df.drop(columns=['id_obra', target], errors='ignore')
     y = df[target]
+    return X, y
+
+def train(regressor=None):
+    print("🚀 Iniciando treinamento do modelo CCbjj IA...")
+
+    # 2. Carregamento dos dados
+    dados = carregar_dados()
+    if dados is None:
+        return
+    X, y = dados
 
     # Salvar contrato de variáveis
     feature_names = X.columns.tolist()
     joblib.dump(feature_names, META_PATH)
 
     # 5. Definição de Colunas por Tipo
-    cat_features = ['cidade', 'tipo_solo', 'material', 'etapa']
+    cat_features = CAT_FEATURES
     num_features = [col for col in X.columns if col not in cat_features]
 
-    
-
     # 6. Criação do Processador (Pipeline Robusto)
-    # Adicionamos SimpleImputer para que o modelo não quebre se houver nulos em produção
-    numeric_transformer = Pipeline(steps=[
-        ('imputer', SimpleImputer(strategy='median')),
-        ('scaler', StandardScaler())
-    ])
-
-    categorical_transformer = Pipeline(steps=[
-        ('imputer', SimpleImputer(strategy='constant', fill_value='desconhecido')),
-        ('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=False))
-    ])
-
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ('cat', categorical_transformer, cat_features),
-            ('num', numeric_transformer, num_features)
-        ])
+    preprocessor = montar_preprocessor(cat_features, num_features)
 
     # 7. Pipeline de Produção CCbjj
     model_pipeline = Pipeline(steps=[
         ('preprocessor', preprocessor),
-        ('regressor', RandomForestRegressor(
-            n_estimators=300,
-            max_depth=12,
-            min_samples_leaf=2,
-            random_state=42,
-            n_jobs=-1
-        ))
+        ('regressor', regressor if regressor is not None else regressor_padrao())
     ])
 
     # 8. Divisão Treino/Teste
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
     # 9. Execução do Treinamento
-    print(f"🧠 Treinando floresta com {len(X_train)} exemplos...")
+    print(f"🧠 Treinando {type(model_pipeline.named_steps['regressor']).__name__} com {len(X_train)} exemplos...")
     model_pipeline.fit(X_train, y_train)
 
     # 10. Avaliação
@@ -102,5 +145,207 @@ def train():
     joblib.dump(model_pipeline, MODEL_PATH)
     print(f"💾 Modelo salvo em: {MODEL_PATH}")
 
+    # 12. Artefato leve para produção (motor compilado, compartilhável via mmap)
+    # O motor NumPy só cobre florestas; para outros regressores o bot usa pipeline.predict
+    motor = None
+    if isinstance(model_pipeline.named_steps['regressor'], RandomForestRegressor):
+        motor = compilar_ou_none(model_pipeline, feature_names)
+    if motor is not None:
+        exportar(motor, fingerprint_modelo(MODEL_PATH), MOTOR_PATH)
+        print(f"💾 Motor de inferência (mmap) salvo em: {MOTOR_PATH}")
+    elif os.path.exists(MOTOR_PATH):
+        # Motor do modelo anterior não vale mais: remove em vez de depender só do fingerprint
+        os.remove(MOTOR_PATH)
+        print(f"🗑️ Motor de inferência anterior removido ({MOTOR_PATH}); produção usará pipeline.predict.")
+
+    return model_pipeline
+
+# --- MODO TUNING (successive halving em pool de processos) ---
+# Estado por processo: folds já transformados (carregados uma vez no initializer)
+_WORKER = {"folds": None}
+
+def _init_worker(folds):
+    _WORKER["folds"] = folds
+
+def candidatos(boosting: bool = False) -> list:
+    """Estimadores da busca (n_jobs=1: o paralelismo vem do pool de processos)."""
+    lista = [
+        RandomForestRegressor(random_state=42, n_jobs=1, **params)
+        for params in ParameterGrid(GRADE_FLORESTA)
+    ]
+    if boosting:
+        # Early stopping interno (validação de 10%) limita o nº de iterações
+        lista += [
+            HistGradientBoostingRegressor(max_iter=500, early_stopping=True, random_state=42, **params)
+            for params in ParameterGrid(GRADE_BOOSTING)
+        ]
+    return lista
+
+def descrever(estimador) -> str:
+    nome = type(estimador).__name__.replace("Regressor", "")
+    grade = GRADE_FLORESTA if isinstance(estimador, RandomForestRegressor) else GRADE_BOOSTING
+    params = estimador.get_params()
+    return f"{nome}(" + ", ".join(f"{k}={params[k]}" for k in grade) + ")"
+
+def preparar_folds(preprocessor, X, y, n_folds: int = N_FOLDS) -> list:
+    """
+    ColumnTransformer ajustado UMA vez por fold (só no treino do fold); as rodadas reutilizam
+    as matrizes transformadas. Linhas embaralhadas: os primeiros n formam a subamostra da rodada.
+    Guarda também o preprocessor do fold e linhas brutas de validação (latência de serviço).
+    """
+    folds = []
+    for treino, valid in KFold(n_folds, shuffle=True, random_state=42).split(X):
+        prep = clone(preprocessor).fit(X.iloc[treino], y.iloc[treino])
+        folds.append((
+            np.asarray(prep.transform(X.iloc[treino]), dtype=np.float32), y.iloc[treino].to_numpy(),
+            np.asarray(prep.transform(X.iloc[valid]), dtype=np.float32), y.iloc[valid].to_numpy(),
+            prep, X.iloc[valid[:1000]],
+        ))
+    return folds
+
+def medir_latencia(modelo, prep, X_bruto, repeticoes: int = 7) -> dict:
+    """
+    Latência como em produção, a partir das linhas brutas: floresta pelo motor compilado
+    (caminho do bot), demais modelos pelo pipeline completo. Mediana (ms) de uma consulta
+    (LOTE_LATENCIA linhas) e de um lote de 1000 linhas.
+    """
+    pipeline = Pipeline(steps=[('preprocessor', prep), ('regressor', modelo)])
+    motor = compilar_ou_none(pipeline, list(X_bruto.columns)) if isinstance(modelo, RandomForestRegressor) else None
+    servico = motor if motor is not None else pipeline
+
+    def mediana_ms(lote):
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            servico.predict(lote)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        return float(np.median(tempos))
+    return {
+        "latencia_consulta_ms": mediana_ms(X_bruto.iloc[:LOTE_LATENCIA]),
+        "latencia_lote_1000_ms": mediana_ms(X_bruto),
+        "servido_por": "motor" if motor is not None else "pipeline",
+    }
+
+def _avaliar(tarefa):
+    """Ajusta um candidato nas `n_linhas` primeiras linhas de um fold e mede erro e latência."""
+    idx, estimador, fold, n_linhas = tarefa
+    X_tr, y_tr, X_va, y_va, prep, X_bruto = _WORKER["folds"][fold]
+    inicio = time.perf_counter()
+    modelo = clone(estimador).fit(X_tr[:n_linhas], y_tr[:n_linhas])
+    ajuste_s = time.perf_counter() - inicio
+    preds = modelo.predict(X_va)
+    return {
+        "idx": idx, "fold": fold, "mae": mean_absolute_error(y_va, preds), "r2": r2_score(y_va, preds),
+        "ajuste_s": ajuste_s, **medir_latencia(modelo, prep, X_bruto),
+    }
+
+def successive_halving(estimadores, folds, workers: int) -> list:
+    """
+    Rodadas com 1/FATOR_HALVING dos candidatos e FATOR_HALVING x as linhas, até a base inteira
+    (parada antecipada dos candidatos ruins com orçamento pequeno). Retorna o histórico por rodada.
+    """
+    n_total = min(len(f[1]) for f in folds)
+    n_rodadas = max(1, math.ceil(math.log(len(estimadores), FATOR_HALVING)))
+    vivos = list(range(len(estimadores)))
+    historico = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(folds,)) as pool:
+        for rodada in range(n_rodadas):
+            n_linhas = n_total // FATOR_HALVING ** (n_rodadas - 1 - rodada)
+            n_linhas = min(n_total, max(n_linhas, MIN_LINHAS_RODADA))
+            inicio = time.perf_counter()
+            tarefas = [(i, estimadores[i], f, n_linhas) for i in vivos for f in range(len(folds))]
+            resultados = pd.DataFrame(list(pool.map(_avaliar, tarefas)))
+            resumo = resultados.groupby("idx").mean(numeric_only=True).drop(columns="fold").sort_values("mae")
+            resumo["servido_por"] = resultados.groupby("idx")["servido_por"].first()
+            resumo.insert(0, "candidato", [descrever(estimadores[i]) for i in resumo.index])
+            resumo.insert(1, "rodada", rodada)
+            resumo.insert(2, "n_linhas", n_linhas)
+            historico.append(resumo)
+            print(f"🔎 Rodada {rodada + 1}/{n_rodadas}: {len(vivos)} candidatos x {len(folds)} folds "
+                  f"com {n_linhas} linhas em {time.perf_counter() - inicio:.1f}s "
+                  f"(melhor MAE {resumo['mae'].iloc[0]:.3f})")
+            if rodada < n_rodadas - 1:
+                vivos = resumo.index[:max(1, math.ceil(len(vivos) / FATOR_HALVING))].tolist()
+    return historico
+
+def recomendar(final: pd.DataFrame):
+    """
+    Mais preciso, a menos que um candidato com MAE até TOLERANCIA_MAE acima do melhor sirva
+    a consulta do bot em no máximo GANHO_LATENCIA do tempo (ex.: floresta menor, bem mais barata).
+    """
+    melhor = final["mae"].idxmin()
+    aceitaveis = final[final["mae"] <= final.loc[melhor, "mae"] * (1 + TOLERANCIA_MAE)]
+    rapido = aceitaveis["latencia_consulta_ms"].idxmin()
+    if aceitaveis.loc[rapido, "latencia_consulta_ms"] <= GANHO_LATENCIA * final.loc[melhor, "latencia_consulta_ms"]:
+        return rapido
+    return melhor
+
+def tune(boosting: bool = False, workers: int = None, aplicar: bool = False):
+    print("🎛️ Modo tuning: busca por successive halving (precisão x latência)...")
+    dados = carregar_dados()
+    if dados is None:
+        return None
+    X, y = dados
+    workers = workers or os.cpu_count() or 1
+    num_features = [col for col in X.columns if col not in CAT_FEATURES]
+    preprocessor = montar_preprocessor(CAT_FEATURES, num_features)
+
+    # Mesmo hold-out do treino padrão; a busca usa só os 80% de treino
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    inicio = time.perf_counter()
+    folds = preparar_folds(preprocessor, X_train, y_train)
+    print(f"🧱 Pré-processamento ajustado em {len(folds)} folds ({time.perf_counter() - inicio:.1f}s)")
+
+    estimadores = candidatos(boosting)
+    historico = successive_halving(estimadores, folds, workers)
+    final = historico[-1]
+    escolhido = recomendar(final)
+
+    # Fronteira precisão x latência da última rodada (base inteira)
+    print("-" * 100)
+    print(f"{'Candidato':<58}{'MAE':>8}{'R²':>8}{'ms/consulta':>13}{'ms/1000':>9}")
+    for idx, linha in final.iterrows():
+        marca = " ⭐" if idx == escolhido else ""
+        print(f"{linha['candidato']:<58}{linha['mae']:>8.3f}{linha['r2']:>8.3f}"
+              f"{linha['latencia_consulta_ms']:>13.2f}{linha['latencia_lote_1000_ms']:>9.1f} ({linha['servido_por']}){marca}")
+    print("-" * 100)
+
+    # Avaliação honesta do recomendado no hold-out (pipeline completo, como em produção)
+    pipeline = Pipeline(steps=[('preprocessor', preprocessor), ('regressor', clone(estimadores[escolhido]))])
+    pipeline.fit(X_train, y_train)
+    preds = pipeline.predict(X_test)
+    teste = {"mae": mean_absolute_error(y_test, preds), "r2": r2_score(y_test, preds)}
+    print(f"⭐ Recomendado: {final.loc[escolhido, 'candidato']} | hold-out MAE {teste['mae']:.2f} dias, "
+          f"R² {teste['r2']*100:.1f}%")
+
+    os.makedirs(os.path.dirname(TUNING_REPORT_PATH), exist_ok=True)
+    relatorio = {
+        "recomendado": final.loc[escolhido, "candidato"],
+        "parametros": {k: v for k, v in estimadores[escolhido].get_params().items() if k != "n_jobs"},
+        "holdout": teste,
+        "tolerancia_mae": TOLERANCIA_MAE,
+        "ganho_latencia": GANHO_LATENCIA,
+        "rodadas": [r.reset_index(drop=True).to_dict(orient="records") for r in historico],
+    }
+    with open(TUNING_REPORT_PATH, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2, default=str)
+    print(f"💾 Relatório de tuning salvo em: {TUNING_REPORT_PATH}")
+
+    if aplicar:
+        # Modelo de produção usa todos os núcleos na predição em lote
+        train(clone(estimadores[escolhido]).set_params(
+            **({"n_jobs": -1} if "n_jobs" in estimadores[escolhido].get_params() else {})
+        ))
+    return relatorio
+
 if __name__ == "__main__":
-    train()
+    parser = argparse.ArgumentParser(description="Treino do modelo CCBJJ (padrão) ou busca de hiperparâmetros.")
+    parser.add_argument("--tune", action="store_true", help="successive halving sobre floresta (e boosting)")
+    parser.add_argument("--boosting", action="store_true", help="inclui HistGradientBoosting na busca")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--aplicar", action="store_true", help="treina e exporta o recomendado")
+    args = parser.parse_args()
+    if args.tune:
+        tune(boosting=args.boosting, workers=args.workers, aplicar=args.aplicar)
+    else:
+        train()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Os módulos do projeto são scripts planos em scripts/ (importados como `import x`)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
@@ -0,0 +1,37 @@
+import database
+
+
+def test_tabela_criada_no_primeiro_uso_sem_init_db(tmp_path, monkeypatch):
+    # Deploy novo, sem DATABASE_URL e sem lifespan: nenhuma chamada a init_db()
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "users.db")
+    monkeypatch.setattr(database, "_SQLITE_CONN", None)
+    monkeypatch.setattr(database, "_SCHEMA_PRONTO", False)
+    database._invalidate_settings(1)
+
+    database.set_language(1, "en")
+    database.set_storage_mode(1, "CSV")
+
+    assert database.get_user_settings(1) == {"language": "en", "storage_mode": "CSV"}
+    database.init_db()  # idempotente depois do uso
+    database._SQLITE_CONN.close()
+
+
+def test_leitura_concorrente_com_escrita_nao_grava_valor_antigo(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "users.db")
+    monkeypatch.setattr(database, "_SQLITE_CONN", None)
+    database._invalidate_settings(2)
+    database.set_language(2, "pt")
+
+    original = database._execute_query
+    def consulta_com_escrita_no_meio(query, params=None, fetch=False):
+        rows = original(query, params, fetch)
+        if query == database.QUERY_GET_SETTINGS:
+            # /language chega depois da leitura e antes de ela gravar no cache
+            monkeypatch.setattr(database, "_execute_query", original)
+            database.set_language(2, "en")
+        return rows
+    monkeypatch.setattr(database, "_execute_query", consulta_com_escrita_no_meio)
+
+    assert database.get_user_settings(2)["language"] == "pt"  # valor lido antes da escrita
+    assert database.get_user_settings(2)["language"] == "en"  # cache não ficou com o antigo
+    database._SQLITE_CONN.close()
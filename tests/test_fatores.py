@@ -0,0 +1,44 @@
+import logging
+from pathlib import Path
+
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.pipeline import Pipeline
+
+from telegram_bot import contribuicoes_perturbacao, explicar_obra, valores_referencia
+from train_model import montar_preprocessor
+
+CSV = Path(__file__).resolve().parents[1] / "data" / "processed" / "base_consulta_botccbjj.csv"
+CAT = ["tipo_solo", "material", "cidade", "etapa"]
+NUM = ["orcamento_estimado", "rating_confiabilidade", "taxa_insucesso_fornecedor", "complexidade_obra", "nivel_chuva"]
+
+
+def _pipeline_hgb(df):
+    pipe = Pipeline([("preprocessor", montar_preprocessor(CAT, NUM)),
+                     ("regressor", HistGradientBoostingRegressor(max_iter=30, random_state=0))])
+    return pipe.fit(df[NUM + CAT], df["risco_etapa"])
+
+
+def test_fatores_sem_motor_vem_da_perturbacao():
+    df = pd.read_csv(CSV)
+    pipe = _pipeline_hgb(df)
+    X = df[df["id_obra"] == df["id_obra"].iloc[0]][NUM + CAT]
+    ref = valores_referencia(df, NUM + CAT)
+    res = {"motor": None, "pipeline": pipe, "referencia_fatores": ref}
+
+    fatores = explicar_obra(res, X)
+    assert fatores
+    contrib = contribuicoes_perturbacao(pipe, X, ref)
+    esperado = contrib.reindex(contrib.abs().sort_values(ascending=False).index).iloc[0]
+    assert fatores[0][1] == float(esperado)
+    # Trocar a feature pela referência muda a predição exatamente pela contribuição
+    col = contrib.abs().idxmax()
+    delta = pipe.predict(X).mean() - pipe.predict(X.assign(**{col: ref[col]})).mean()
+    assert abs(delta - contrib[col]) < 1e-9
+
+
+def test_fatores_indisponiveis_avisam(caplog):
+    X = pd.read_csv(CSV).head(3)[NUM + CAT]
+    with caplog.at_level(logging.WARNING):
+        assert explicar_obra({"motor": None, "pipeline": None, "referencia_fatores": None}, X) == ()
+    assert "Fatores de risco indisponíveis" in caplog.text
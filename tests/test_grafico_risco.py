@@ -0,0 +1,20 @@
+import pytest
+
+from grafico_risco import RenderizadorGrafico, cor_risco, faixa_risco
+from telegram_bot import classificar_risco
+
+STATUS_COR = {"🟢": "green", "🟡": "orange", "🔴": "red"}
+
+
+@pytest.mark.parametrize("risco", [6.96, 7.0, 7.04, 9.96, 10.0, 10.04, 12.3])
+def test_cor_do_grafico_concorda_com_status(risco):
+    assert cor_risco(risco) == STATUS_COR[classificar_risco(risco)[0]]
+
+
+def test_mesma_faixa_com_cores_diferentes_nao_compartilham_png():
+    assert faixa_risco(7.0) == faixa_risco(7.04)
+    renderizador = RenderizadorGrafico()
+    verde = renderizador.render(7.0, "CCBJJ-100", "pt").getvalue()
+    amarelo = renderizador.render(7.04, "CCBJJ-100", "pt").getvalue()
+    assert verde != amarelo
+    assert renderizador.stats()["misses"] == 2
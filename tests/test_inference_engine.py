@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+
+from inference_engine import carregar_motor, compilar, exportar
+from prediction_cache import fingerprint_modelo
+from train_model import montar_preprocessor
+
+CSV = Path(__file__).resolve().parents[1] / "data" / "processed" / "base_consulta_botccbjj.csv"
+CAT = ["tipo_solo", "material", "cidade", "etapa"]
+NUM = ["orcamento_estimado", "rating_confiabilidade", "taxa_insucesso_fornecedor", "complexidade_obra", "nivel_chuva"]
+FEATURES = NUM + CAT
+
+
+@pytest.fixture(scope="module")
+def base():
+    return pd.read_csv(CSV)
+
+
+@pytest.fixture(scope="module")
+def pipeline(base):
+    pipe = Pipeline([("preprocessor", montar_preprocessor(CAT, NUM)),
+                     ("regressor", RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0))])
+    return pipe.fit(base[FEATURES], base["risco_etapa"])
+
+
+def test_predict_identico_ao_pipeline(base, pipeline):
+    motor = compilar(pipeline, FEATURES)
+    X = base[FEATURES]
+    assert np.array_equal(motor.predict(X), pipeline.predict(X))
+    linha = X.iloc[[7]]
+    assert np.array_equal(motor.predict(linha), pipeline.predict(linha))
+    assert np.array_equal(motor.predict(linha.iloc[0].to_dict()), pipeline.predict(linha))
+
+
+def test_categoria_desconhecida_e_numerico_nan(base, pipeline):
+    motor = compilar(pipeline, FEATURES)
+    X = base[FEATURES].head(5).copy()
+    X.loc[X.index[0], "tipo_solo"] = "vulcanico"
+    X.loc[X.index[1], "cidade"] = np.nan
+    X.loc[X.index[2], "nivel_chuva"] = np.nan
+    X.loc[X.index[3], "orcamento_estimado"] = np.nan
+    assert np.array_equal(motor.predict(X), pipeline.predict(X))
+
+
+def test_contribuicoes_somam_a_predicao(base, pipeline):
+    motor = compilar(pipeline, FEATURES)
+    X = base[FEATURES].head(50)
+    vies, contrib = motor.contribuicoes(X)
+    assert sorted(contrib.columns) == sorted(FEATURES)
+    np.testing.assert_allclose(vies + contrib.sum(axis=1).to_numpy(), motor.predict(X), rtol=0, atol=1e-9)
+
+
+def test_motor_mmap_prediz_igual_e_rejeita_fingerprint_antigo(base, pipeline, tmp_path):
+    pkl, artefato = tmp_path / "pipeline.pkl", tmp_path / "motor.joblib"
+    joblib.dump(pipeline, pkl)
+    exportar(compilar(pipeline, FEATURES), fingerprint_modelo(pkl), artefato)
+
+    motor = carregar_motor(pkl, artefato, mmap=True)
+    assert isinstance(motor.value2, np.memmap)
+    X = base[FEATURES]
+    assert np.array_equal(motor.predict(X), pipeline.predict(X))
+
+    # Re-treino grava outro .pkl: o artefato antigo não pode ser usado
+    joblib.dump(clone(pipeline).set_params(regressor__random_state=1).fit(X, base["risco_etapa"]), pkl)
+    assert carregar_motor(pkl, artefato, mmap=True) is None
@@ -0,0 +1,27 @@
+from ranking_portfolio import RankingRisco
+from telegram_bot import interpretar_filtro_portfolio, normalizar_texto
+
+
+def _ranking():
+    ranking = RankingRisco()
+    ranking.atualizar("CCBJJ-100", {"fundação": 8.0, "estrutura": 6.0}, "São Paulo")
+    ranking.atualizar("CCBJJ-101", {"fundação": 4.0}, "recife")
+    return ranking
+
+
+def test_normalizar_texto():
+    assert normalizar_texto("  São   PAULO ") == "sao paulo"
+    assert normalizar_texto("Fundação") == "fundacao"
+
+
+def test_filtro_ignora_acento_e_caixa():
+    ranking = _ranking()
+    assert interpretar_filtro_portfolio(["sao", "paulo"], ranking) == (10, "São Paulo", None)
+    assert interpretar_filtro_portfolio(["5", "FUNDACAO"], ranking) == (5, None, "fundação")
+    assert interpretar_filtro_portfolio(["Recife"], ranking) == (10, "recife", None)
+
+
+def test_filtro_desconhecido_e_vazio():
+    ranking = _ranking()
+    assert interpretar_filtro_portfolio(["manaus"], ranking) == (10, "manaus", None)
+    assert interpretar_filtro_portfolio([], ranking) == (10, None, None)
@@ -0,0 +1,21 @@
+import os
+
+from prediction_cache import PredictionCache, fingerprint_modelo
+
+
+def test_retreino_em_disco_nao_reaproveita_versao_nova(tmp_path):
+    modelo = tmp_path / "pipeline.pkl"
+    modelo.write_bytes(b"modelo-v1")
+    versao_carregada = fingerprint_modelo(modelo)
+    cache = PredictionCache(modelo, model_version=versao_carregada)
+    cache.put("CCBJJ-100", "h", 6.5, "🟢 NORMAL")
+
+    modelo.write_bytes(b"modelo-v2 (re-treino)")
+    os.utime(modelo, ns=(1, 1))  # garante mtime diferente mesmo em FS de baixa resolução
+
+    # O processo ainda serve o modelo v1: a entrada continua válida sob a versão carregada
+    item = cache.get("CCBJJ-100", "h")
+    assert item is not None and item.risco == 6.5
+    assert cache.model_version == versao_carregada
+    assert cache.desatualizado
+    assert cache.versao_em_disco == fingerprint_modelo(modelo)
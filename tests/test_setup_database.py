@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from setup_database import preparar_chunk, ROW_HASH_COL
+
+
+def _lote():
+    return pd.DataFrame({
+        "id_obra": ["CCBJJ-100", "CCBJJ-100", "CCBJJ-101"],
+        "orcamento_estimado": [21033204.23, 21033204.23, 5000000.0],
+        "nivel_chuva": [47, 120, 300],
+        "tipo_solo": ["argiloso", "argiloso", "arenoso"],
+        "etapa": ["fundação", "estrutura", "fundação"],
+    })
+
+
+def test_hash_estavel_quando_lote_tem_nan():
+    original = preparar_chunk(_lote())
+    com_nan = _lote()
+    com_nan.loc[2, "nivel_chuva"] = np.nan  # int64 -> float64 no lote inteiro
+    com_nan = preparar_chunk(com_nan)
+
+    assert (original[ROW_HASH_COL].iloc[:2] == com_nan[ROW_HASH_COL].iloc[:2]).all()
+    assert original[ROW_HASH_COL].iloc[2] != com_nan[ROW_HASH_COL].iloc[2]
+
+
+def test_hash_estavel_com_coluna_texto_toda_nula():
+    a = _lote()
+    a["tipo_solo"] = [None, None, None]
+    b = _lote().astype({"tipo_solo": object})
+    b["tipo_solo"] = np.nan  # read_csv infere float64 para coluna toda nula
+    assert (preparar_chunk(a)[ROW_HASH_COL] == preparar_chunk(b)[ROW_HASH_COL]).all()
@@ -0,0 +1,28 @@
+import pandas as pd
+from sqlalchemy import create_engine
+
+from telegram_bot import buscar_obra_supabase, montar_query_supabase, tem_coluna_normalizada
+
+FEATURES = ["nivel_chuva", "etapa"]
+
+
+def _engine(df):
+    engine = create_engine("sqlite://")
+    df.to_sql("dashboard_obras", engine, index=False)
+    return engine
+
+
+def test_tabela_antiga_sem_coluna_normalizada_usa_fallback():
+    engine = _engine(pd.DataFrame({"id_obra": [" ccbjj-100 "], "nivel_chuva": [47], "etapa": ["fundação"]}))
+    assert not tem_coluna_normalizada(engine)
+    res = {"engine": engine, "supabase_query": montar_query_supabase(FEATURES, tem_coluna_normalizada(engine))}
+    assert buscar_obra_supabase(res, "CCBJJ-100")["nivel_chuva"].tolist() == [47]
+
+
+def test_tabela_nova_usa_coluna_normalizada():
+    engine = _engine(pd.DataFrame({"id_obra": ["ccbjj-100"], "id_obra_norm": ["CCBJJ-100"],
+                                   "nivel_chuva": [47], "etapa": ["fundação"]}))
+    assert tem_coluna_normalizada(engine)
+    query = montar_query_supabase(FEATURES, True)
+    assert "id_obra_norm" in str(query)
+    assert buscar_obra_supabase({"engine": engine, "supabase_query": query}, "ccbjj-100").shape == (1, 2)